@@ -1,18 +1,22 @@
 from fastapi import FastAPI, Depends
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.middleware.cors import CORSMiddleware
 from typing import Union
 from app.common.config import (
     LocalConfig,
     ProdConfig,
     TestConfig,
 )
+from app.database.access_key_filter import access_key_filter
 from app.database.schema import db
-from app.middlewares.token_validator import access_control
-from app.middlewares.trusted_hosts import TrustedHostMiddleware
+from app.middlewares.rate_limiter import rate_limiter
+from app.middlewares.token_validator import AccessControlMiddleware
 from app.routers import index, auth, services, users
 from app.dependencies import api_service_dependency, user_dependency
+from app.utils.encoding_and_hashing import password_hasher
+from app.utils.http_client import kakao_client
+from app.utils.logger import api_log_writer
+from app.utils.mailer import mailer
 import logging
+from time import perf_counter
 
 
 def create_app(config: Union[LocalConfig, ProdConfig, TestConfig]) -> FastAPI:
@@ -20,21 +24,15 @@ def create_app(config: Union[LocalConfig, ProdConfig, TestConfig]) -> FastAPI:
     new_app = FastAPI()
     # Middlewares
     """
-    Access control middleware: Authorized request only
-    CORS middleware: Allowed sites only
-    Trusted host middleware: Allowed host only
+    Access control middleware, in a single pass:
+    1. Trusted host: Allowed host only
+    2. CORS: Allowed sites only
+    3. Access control: Authorized request only
     """
-    new_app.add_middleware(dispatch=access_control, middleware_class=BaseHTTPMiddleware)
     new_app.add_middleware(
-        CORSMiddleware,
-        allow_origins=config.allowed_sites,
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
-    )
-    new_app.add_middleware(
-        TrustedHostMiddleware,
-        allowed_hosts=config.trusted_hosts,
+        AccessControlMiddleware,
+        trusted_hosts=config.trusted_hosts,
+        allowed_sites=config.allowed_sites,
         except_path=["/health"],
     )
 
@@ -61,13 +59,23 @@ def create_app(config: Union[LocalConfig, ProdConfig, TestConfig]) -> FastAPI:
 
     @new_app.on_event("startup")
     async def startup():
-        # self.engine.connect()
-        logging.critical(">>> DB connected")
+        started_at = perf_counter()
+        await db.init(config=config)
+        api_log_writer.start()
+        kakao_client.start()
+        await access_key_filter.build()
+        logging.critical(
+            f">>> DB connected, app started in {(perf_counter() - started_at) * 1000:.1f}ms"
+        )
 
     @new_app.on_event("shutdown")
     async def shutdown():
-        await db.session.remove()
-        await db.engine.dispose()
+        await db.dispose_engines()
+        password_hasher.shutdown()
+        await kakao_client.close()
+        await mailer.close()
+        rate_limiter.table.close()
+        await api_log_writer.stop()
         logging.critical(">>> DB disconnected")
 
     return new_app
@@ -1,6 +1,8 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
 from os import environ
+from os.path import isdir, join
+from tempfile import gettempdir
 from typing import Union, Optional
 from pathlib import Path
 
@@ -32,6 +34,8 @@ SAMPLE_JWT_TOKEN: str = environ.get("SAMPLE_JWT_TOKEN")
 SAMPLE_ACCESS_KEY: str = environ.get("SAMPLE_ACCESS_KEY")
 SAMPLE_SECRET_KEY: str = environ.get("SAMPLE_SECRET_KEY")
 KAKAO_RESTAPI_TOKEN: str = environ.get("KAKAO_RESTAPI_TOKEN")
+EMAIL_ADDR: str = environ.get("EMAIL_ADDR")
+EMAIL_PW: str = environ.get("EMAIL_PW")
 JWT_ALGORITHM: str = "HS256"
 EXCEPT_PATH_LIST: list = ["/", "/openapi.json"]
 EXCEPT_PATH_REGEX: str = "^(/docs|/redoc|/api/auth|/favicon.ico)"
@@ -40,6 +44,7 @@ MAX_API_KEY: int = 3
 MAX_API_WHITELIST: int = 10
 KAKAO_IMAGE_URL: str = "http://k.kakaocdn.net/dn/wwWjr/btrYVhCnZDF/2bgXDJth2LyIajIjILhLK0/kakaolink40_original.png"
 BASE_DIR: str = Path(__file__).parents[2]
+SHM_DIR: str = "/dev/shm" if isdir("/dev/shm") else gettempdir()
 
 """
 400 Bad Request
@@ -47,6 +52,7 @@ BASE_DIR: str = Path(__file__).parents[2]
 403 Forbidden
 404 Not Found
 405 Method not allowed
+429 Too many requests
 500 Internal Error
 502 Bad Gateway
 504 Timeout
@@ -58,6 +64,10 @@ BASE_DIR: str = Path(__file__).parents[2]
 @dataclass(frozen=True)
 class Config(metaclass=SingletonMetaClass):
     db_pool_recycle: int = 900
+    db_pool_size: int = 10
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0  # Seconds to wait for a connection
+    db_liveness_check_interval: float = 30.0  # Ping connections idle longer
     db_echo: bool = True
     debug: bool = False
     test_mode: bool = False
@@ -67,8 +77,50 @@ class Config(metaclass=SingletonMetaClass):
     mysql_password: str = MYSQL_PASSWORD
     mysql_database: str = MYSQL_DATABASE
     mysql_host: str = MYSQL_HOST
+    replica_database_urls: list = field(default_factory=list)  # Reads go here
+    replica_retry_interval: float = 30.0  # Seconds a failed replica is skipped
     trusted_hosts: list = field(default_factory=lambda: ["*"])
     allowed_sites: list = field(default_factory=lambda: ["*"])
+    api_key_cache_maxsize: int = 1024
+    api_key_cache_ttl: int = 60  # Also how long other workers may serve a stale key
+    access_key_filter_capacity: int = 100000
+    access_key_filter_error_rate: float = 0.001
+    access_key_filter_refresh_interval: float = 1.0  # Min. seconds between refreshes
+    access_key_filter_refresh_overlap: float = 60.0  # Seconds of created_at re-read
+    negative_cache_maxsize: int = 10000
+    negative_cache_ttl: int = 30
+    token_cache_max_bytes: int = 8 * 1024 * 1024
+    token_cache_ttl: int = 600  # Only for tokens without "exp" claim
+    bcrypt_rounds: int = 12
+    bcrypt_max_concurrency: int = 2
+    log_queue_size: int = 10000
+    log_batch_size: int = 200
+    log_flush_interval: float = 0.5
+    log_success_sample_rate: float = 1.0
+    n_plus_one_threshold: int = 5  # Same SELECT this many times in a request
+    rate_limit_enabled: bool = True
+    ip_rate_limit: float = 20.0  # Tokens refilled per second
+    ip_rate_burst: int = 40
+    api_key_rate_limit: float = 10.0  # Default of API keys without own limits
+    api_key_rate_burst: int = 20
+    rate_limit_table_path: str = join(SHM_DIR, "api_rate_limit.table")
+    rate_limit_table_slots: int = 65536
+    kakao_api_url: str = "https://kapi.kakao.com"
+    kakao_connect_timeout: float = 3.0
+    kakao_read_timeout: float = 10.0
+    kakao_max_connections: int = 20  # Kept alive and reused
+    kakao_max_concurrency: int = 20  # Requests in flight, the rest wait
+    kakao_max_retries: int = 2
+    kakao_retry_backoff: float = 0.2  # Seconds, doubled per retry, jittered
+    smtp_host: str = "smtp.gmail.com"
+    smtp_port: int = 465
+    smtp_use_tls: bool = True
+    smtp_sender_name: str = "라이언X코알라"
+    smtp_pool_size: int = 3  # Connections kept open and reused
+    smtp_rate_limit: float = (
+        5.0  # Mails per second over all connections, 0 for no limit
+    )
+    smtp_timeout: float = 10.0
 
     @staticmethod
     def get(
@@ -107,6 +159,8 @@ class ProdConfig(Config, metaclass=SingletonMetaClass):
 @dataclass(frozen=True)
 class TestConfig(Config, metaclass=SingletonMetaClass):
     test_mode: bool = True
+    bcrypt_rounds: int = 4
+    rate_limit_enabled: bool = False
     mysql_host: str = "localhost"
     mysql_database: str = MYSQL_TEST_DATABASE
 
@@ -0,0 +1,152 @@
+from asyncio import Task, get_running_loop, shield
+from datetime import datetime, timedelta
+from time import monotonic
+from typing import Optional
+from sqlalchemy import select
+from app.common.config import Config
+from app.database.schema import db, ApiKeys, utc_now
+from app.utils.bloom_filter import BloomFilter
+from app.utils.cache_utils import StatsTTLCache
+
+
+class AccessKeyFilter:
+    """
+    Rejects definitely-unknown access keys without a DB round trip.
+    A bloom filter of all access keys is built at startup. On a miss, keys created
+    since the previous refresh by other workers are pulled in (by `created_at`,
+    overlapping by `refresh_overlap` for late commits and clock skew) before
+    rejecting, at most once per `refresh_interval`: within it, misses are rejected
+    without a DB round trip, so a key created on another worker may be rejected
+    for up to `refresh_interval` seconds.
+    Concurrent lookups share a refresh, and keys that turned out not to exist
+    are kept in a short-lived negative cache.
+    Until `build` is called, every key is let through.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        error_rate: float,
+        refresh_interval: float,
+        refresh_overlap: float,
+        negative_cache_maxsize: int,
+        negative_cache_ttl: int,
+    ) -> None:
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self.refresh_overlap = timedelta(seconds=refresh_overlap)
+        self.negative_cache: StatsTTLCache = StatsTTLCache(
+            maxsize=negative_cache_maxsize, ttl=negative_cache_ttl
+        )
+        self.bloom: Optional[BloomFilter] = None
+        self.last_refreshed: float = 0.0  # Monotonic time a refresh last started at
+        self.refreshed_since: datetime = datetime.min  # UTC time of the same
+        self.refreshes: int = 0
+        self.rejected: int = 0
+        self.false_positives: int = 0
+        self._refresh: Optional[Task] = None
+
+    async def build(self) -> None:
+        started_at, started_at_utc = monotonic(), utc_now()
+        rows = (await db.execute(select(ApiKeys.access_key))).all()
+        bloom = BloomFilter(
+            capacity=max(self.capacity, len(rows) * 2), error_rate=self.error_rate
+        )
+        for (access_key,) in rows:
+            bloom.add(access_key)
+        self.bloom = bloom
+        self.last_refreshed, self.refreshed_since = started_at, started_at_utc
+
+    async def refresh(self) -> None:
+        started_at, started_at_utc = monotonic(), utc_now()
+        self.refreshes += 1
+        rows = (
+            await db.execute(
+                select(ApiKeys.access_key).filter(
+                    ApiKeys.created_at >= self.refreshed_since - self.refresh_overlap
+                )
+            )
+        ).all()
+        for (access_key,) in rows:
+            self.add(access_key)
+        if self.bloom.count > self.bloom.capacity:  # Error rate no longer holds
+            await self.build()
+        else:  # Only once done, so that a failed refresh is not taken as one
+            self.last_refreshed, self.refreshed_since = started_at, started_at_utc
+
+    async def refresh_since(self, requested_at: float) -> None:
+        # Waits for a refresh started at or after `requested_at`, shared by callers
+        while self.last_refreshed < requested_at:
+            if (
+                self._refresh is None
+                or self._refresh.done()
+                or self._refresh.get_loop() is not get_running_loop()
+            ):
+                self._refresh = get_running_loop().create_task(self.refresh())
+            await shield(self._refresh)
+
+    def add(self, access_key: str) -> None:
+        self.negative_cache.pop(access_key, None)
+        if self.bloom is not None and access_key not in self.bloom:
+            self.bloom.add(access_key)
+
+    def discard(self, access_key: str) -> None:
+        # Bloom filters cannot forget, so deleted keys are remembered as negatives
+        self.negative_cache[access_key] = True
+
+    async def might_exist(self, access_key: str) -> bool:
+        if self.bloom is None:
+            return True
+        if self.negative_cache.get(access_key) is not None:
+            self.rejected += 1
+            return False
+        if access_key in self.bloom:
+            return True
+        requested_at = monotonic()
+        if requested_at - self.last_refreshed >= self.refresh_interval:
+            # Created before this lookup, if at all, so the refresh will pull it in
+            await self.refresh_since(requested_at)
+            if access_key in self.bloom:
+                return True
+        self.negative_cache[access_key] = True
+        self.rejected += 1
+        return False
+
+    def record_not_found(self, access_key: str) -> None:
+        # Called when a key passed the filter but is not in DB
+        if self.bloom is not None:
+            self.false_positives += 1
+        self.negative_cache[access_key] = True
+
+    @property
+    def stats(self) -> dict:
+        unknown_lookups = self.rejected + self.false_positives
+        return {
+            "ready": self.bloom is not None,
+            "keys": self.bloom.count if self.bloom is not None else 0,
+            "memory_bytes": self.bloom.memory_bytes if self.bloom is not None else 0,
+            "estimated_false_positive_rate": self.bloom.estimated_false_positive_rate
+            if self.bloom is not None
+            else 0.0,
+            "observed_false_positive_rate": round(
+                self.false_positives / unknown_lookups, 5
+            )
+            if unknown_lookups
+            else 0.0,
+            "rejected": self.rejected,
+            "refreshes": self.refreshes,
+            "false_positives": self.false_positives,
+            "negative_cache": self.negative_cache.stats,
+        }
+
+
+config = Config.get()
+access_key_filter = AccessKeyFilter(
+    capacity=config.access_key_filter_capacity,
+    error_rate=config.access_key_filter_error_rate,
+    refresh_interval=config.access_key_filter_refresh_interval,
+    refresh_overlap=config.access_key_filter_refresh_overlap,
+    negative_cache_maxsize=config.negative_cache_maxsize,
+    negative_cache_ttl=config.negative_cache_ttl,
+)
@@ -2,35 +2,157 @@
 # if environ.get("API_ENV") is None:
 #     load_dotenv()
 #     environ.update({"API_ENV": "test"})
-from collections.abc import Iterable
-from asyncio import current_task
-from typing import Optional, Any, List, Union, Callable, Type
+from collections.abc import AsyncIterable, Iterable
+from asyncio import Task, current_task, to_thread
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from functools import partial
+from time import monotonic, perf_counter
+from typing import (
+    Optional,
+    Any,
+    AsyncIterator,
+    Dict,
+    List,
+    Sequence,
+    Tuple,
+    Union,
+    Callable,
+    Iterator,
+    Type,
+)
 from urllib import parse
 from sqlalchemy import (
     Result,
+    Row,
     ScalarResult,
     Select,
+    Column,
     Delete,
     Update,
+    Table,
+    bindparam,
     create_engine,
+    func,
+    insert,
+    inspect,
+    select,
     text,
 )
+from cachetools import LRUCache
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.engine import CursorResult, Dialect
 from sqlalchemy.engine.base import Engine, Connection
+from sqlalchemy.exc import InterfaceError, InvalidRequestError, OperationalError
 from sqlalchemy.ext.asyncio import (
     async_sessionmaker,
-    async_scoped_session,
+    AsyncConnection,
     create_async_engine,
     AsyncSession,
     AsyncEngine,
 )
-from sqlalchemy_utils import database_exists, create_database
 import logging
 from datetime import datetime
-from sqlalchemy.orm import declarative_base
+from sqlalchemy.orm import Mapper, declarative_base
 from sqlalchemy.orm.decl_api import DeclarativeMeta
+from app.database.pool import InstrumentedAsyncPool, install_liveness_check
+from app.database.query_stats import install_query_stats
+from app.database.schema_sync import is_synced, sync_schema
 from app.common.config import TestConfig, ProdConfig, LocalConfig, SingletonMetaClass
 
 Base: DeclarativeMeta = declarative_base()
+BOOTSTRAP_LOCK: str = "api_db_bootstrap"
+BOOTSTRAP_LOCK_TIMEOUT: int = 60  # Seconds to wait for the worker bootstrapping
+
+
+async def iterate_in_chunks(
+    rows: Union[Iterable[dict], AsyncIterable[dict]], chunk_size: int
+) -> AsyncIterator[List[dict]]:
+    chunk: List[dict] = []
+    if isinstance(rows, AsyncIterable):
+        async for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    else:
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+# Set in a `use_primary` block, so that reads in it go to primary
+read_from_primary: ContextVar[bool] = ContextVar("read_from_primary", default=False)
+
+
+class RequestScope:
+    # Session and connection of a request, acquired on its first DB call, and
+    # whether the request has committed, so that its later reads go to primary
+    __slots__ = ("connection", "session", "read_from_primary", "user", "depth")
+
+    def __init__(self) -> None:
+        self.connection: Optional[AsyncConnection] = None
+        self.session: Optional[AsyncSession] = None
+        self.read_from_primary: bool = False
+        self.user: Optional[Task] = None  # Task using the session, `depth` times
+        self.depth: int = 0
+
+
+# Shared by every DB call made during the current request
+current_request_scope: ContextVar[Optional[RequestScope]] = ContextVar(
+    "current_request_scope", default=None
+)
+
+
+class ReadYourWritesSession(AsyncSession):
+    async def commit(self) -> None:
+        await super().commit()
+        # Until the request ends. Outside a request, use `use_primary` instead
+        scope: Optional[RequestScope] = current_request_scope.get()
+        if scope is not None:
+            scope.read_from_primary = True
+
+
+class ReplicaRouter:
+    """
+    Round robin over replica engines. A replica that failed is skipped for
+    `retry_interval` seconds. Returns None when no replica is available.
+    """
+
+    def __init__(self, engines: List[AsyncEngine], retry_interval: float) -> None:
+        self.engines = engines
+        self.retry_interval = retry_interval
+        self.down_until: Dict[AsyncEngine, float] = {}
+        self.failures: int = 0
+        self._next: int = 0
+
+    def pick(self) -> Optional[AsyncEngine]:
+        now = monotonic()
+        for _ in range(len(self.engines)):
+            engine = self.engines[self._next]
+            self._next = (self._next + 1) % len(self.engines)
+            if self.down_until.get(engine, 0.0) <= now:
+                return engine
+        return None
+
+    def mark_failed(self, engine: AsyncEngine) -> None:
+        self.failures += 1
+        self.down_until[engine] = monotonic() + self.retry_interval
+
+    @property
+    def stats(self) -> dict:
+        now = monotonic()
+        return {
+            "replicas": len(self.engines),
+            "healthy": sum(
+                1 for engine in self.engines if self.down_until.get(engine, 0.0) <= now
+            ),
+            "failures": self.failures,
+        }
 
 
 class MySQL:
@@ -45,6 +167,8 @@ class MySQL:
         "grant_user": "GRANT {grant} ON {on} TO '{to_user}'@'{user_host}'",
         "create_db": "CREATE DATABASE {database} CHARACTER SET utf8mb4 COLLATE utf8mb4_bin;",
         "drop_db": "DROP DATABASE {database};",
+        "get_lock": "SELECT GET_LOCK('{name}', {timeout});",
+        "release_lock": "SELECT RELEASE_LOCK('{name}');",
     }
 
     @staticmethod
@@ -74,6 +198,25 @@ class MySQL:
             conn.execute(text("SET FOREIGN_KEY_CHECKS = 1;"))
             conn.commit()
 
+    @classmethod
+    def get_lock(
+        cls, name: str, timeout: int, engine_or_conn: Union[Engine, Connection]
+    ) -> bool:
+        return bool(
+            cls.execute(
+                cls.query_set["get_lock"].format(name=name, timeout=timeout),
+                engine_or_conn,
+                scalar=True,
+            )
+        )
+
+    @classmethod
+    def release_lock(cls, name: str, engine_or_conn: Union[Engine, Connection]) -> None:
+        return cls.execute(
+            cls.query_set["release_lock"].format(name=name),
+            engine_or_conn,
+        )
+
     @classmethod
     def is_db_exists(
         cls, database: str, engine_or_conn: Union[Engine, Connection]
@@ -163,22 +306,32 @@ class SQLAlchemy(metaclass=SingletonMetaClass):
         self.is_test_mode: bool = None
         self.root_engine: Engine = None
         self.engine: AsyncEngine = None
-        self.session: AsyncSession = None
+        self.session: async_sessionmaker = None
+        self.replica_session: async_sessionmaker = async_sessionmaker(
+            class_=AsyncSession, autocommit=False, autoflush=False, future=True
+        )
+        self.replica_router: Optional[ReplicaRouter] = None
         self.is_initiated = False
+        self.init_seconds: Optional[float] = None
+        # Session runners are built once here, not on every call
+        self._execute_in_session = self.run_in_session(self._execute)
+        self._scalar_in_session = self.run_in_read_session(self._scalar)
+        self._scalars_in_session = self.run_in_read_session(self._scalars)
+        self._rows_in_session = self.run_in_read_session(self._rows)
+        self._add_in_session = self.run_in_session(self._add)
+        self._add_all_in_session = self.run_in_session(self._add_all)
+        self._delete_in_session = self.run_in_session(self._delete)
+        self._bulk_insert_in_session = self.run_in_session(self._bulk_insert)
+        self._bulk_upsert_in_session = self.run_in_session(self._bulk_upsert)
+        self._multirow_inserts: LRUCache = LRUCache(maxsize=64)
 
-    def init(self, config: Union[TestConfig, ProdConfig, LocalConfig]) -> None:
+    async def init(self, config: Union[TestConfig, ProdConfig, LocalConfig]) -> None:
+        # Called once at app startup (lifespan), not at import
         if self.is_initiated:
             return
+        started_at: float = perf_counter()
         self.is_test_mode = True if config.test_mode else False
         SQLAlchemy.log(f"Current config status: {config}")
-        root_url = config.database_url_format.format(
-            dialect="mysql",
-            driver="pymysql",
-            user="root",
-            password=parse.quote(config.mysql_root_password),
-            host=config.mysql_host,
-            database=config.mysql_database,
-        )
         database_url = config.database_url_format.format(
             dialect="mysql",
             driver="aiomysql",
@@ -187,45 +340,247 @@ class SQLAlchemy(metaclass=SingletonMetaClass):
             host=config.mysql_host,
             database=config.mysql_database,
         )
-        if not database_exists(root_url):
-            create_database(root_url)
+        bootstrapped: bool = await to_thread(self.bootstrap, config)
+        self.create_engines(
+            database_url=database_url,
+            replica_database_urls=config.replica_database_urls,
+            replica_retry_interval=config.replica_retry_interval,
+            liveness_check_interval=config.db_liveness_check_interval,
+            echo=config.db_echo,
+            poolclass=InstrumentedAsyncPool,
+            pool_size=config.db_pool_size,
+            max_overflow=config.db_max_overflow,
+            pool_timeout=config.db_pool_timeout,
+            pool_recycle=config.db_pool_recycle,
+        )
+        self.is_initiated = True
+        self.init_seconds = perf_counter() - started_at
+        SQLAlchemy.log(
+            f"DB initiated in {self.init_seconds * 1000:.1f}ms "
+            f"({'bootstrapped' if bootstrapped else 'already bootstrapped'})"
+        )
 
-        self.root_engine = create_engine(root_url, echo=True if config.debug else False)
+    def bootstrap(self, config: Union[TestConfig, ProdConfig, LocalConfig]) -> bool:
+        """
+        Creates database, user, grants and tables with root, under a MySQL advisory
+        lock so that only one worker does it. The schema fingerprint is stored last,
+        so it marks a completed bootstrap: a worker that finds it matching, after
+        waiting for the lock or starting later, skips it. Otherwise, e.g. if the
+        holder died midway, the worker runs it itself.
+        Test mode always runs it, as it drops and recreates every table on boot.
+        Returns whether this worker ran it.
+        """
+        root_url_format = partial(
+            config.database_url_format.format,
+            dialect="mysql",
+            driver="pymysql",
+            user="root",
+            password=parse.quote(config.mysql_root_password),
+            host=config.mysql_host,
+        )
+        server_engine = create_engine(root_url_format(database=""))
+        try:
+            with server_engine.connect() as server_conn:
+                if not MySQL.get_lock(
+                    BOOTSTRAP_LOCK, BOOTSTRAP_LOCK_TIMEOUT, engine_or_conn=server_conn
+                ):
+                    raise TimeoutError(
+                        f"DB bootstrap lock not acquired in {BOOTSTRAP_LOCK_TIMEOUT}s"
+                    )
+                try:
+                    if not self.is_test_mode and self._is_bootstrapped(
+                        config, server_conn, root_url_format
+                    ):
+                        return False
+                    self._bootstrap(config, server_conn, root_url_format)
+                finally:
+                    MySQL.release_lock(BOOTSTRAP_LOCK, engine_or_conn=server_conn)
+                return True
+        finally:
+            server_engine.dispose()
+
+    @staticmethod
+    def _is_bootstrapped(
+        config: Union[TestConfig, ProdConfig, LocalConfig],
+        server_conn: Connection,
+        root_url_format: Callable[..., str],
+    ) -> bool:
+        if not MySQL.is_db_exists(config.mysql_database, engine_or_conn=server_conn):
+            return False
+        engine = create_engine(root_url_format(database=config.mysql_database))
+        try:
+            with engine.connect() as conn:
+                return is_synced(conn, Base.metadata)
+        finally:
+            engine.dispose()
+
+    def _bootstrap(
+        self,
+        config: Union[TestConfig, ProdConfig, LocalConfig],
+        server_conn: Connection,
+        root_url_format: Callable[..., str],
+    ) -> None:
+        if not MySQL.is_db_exists(config.mysql_database, engine_or_conn=server_conn):
+            MySQL.create_db(config.mysql_database, engine_or_conn=server_conn)
+        if not MySQL.is_user_exists(config.mysql_user, engine_or_conn=server_conn):
+            MySQL.create_user(
+                config.mysql_user,
+                config.mysql_password,
+                "%",
+                engine_or_conn=server_conn,
+            )
+        if not MySQL.is_user_granted(
+            config.mysql_user, config.mysql_database, engine_or_conn=server_conn
+        ):
+            MySQL.grant_user(
+                "ALL PRIVILEGES",
+                f"{config.mysql_database}.*",
+                config.mysql_user,
+                "%",
+                engine_or_conn=server_conn,
+            )
+        self.root_engine = create_engine(
+            root_url_format(database=config.mysql_database),
+            echo=True if config.debug else False,
+        )
         with self.root_engine.connect() as conn:
-            if not MySQL.is_user_exists(config.mysql_user, engine_or_conn=conn):
-                MySQL.create_user(
-                    config.mysql_user, config.mysql_password, "%", engine_or_conn=conn
-                )
-            if not MySQL.is_user_granted(
-                config.mysql_user, config.mysql_database, engine_or_conn=conn
-            ):
-                MySQL.grant_user(
-                    "ALL PRIVILEGES",
-                    f"{config.mysql_database}.*",
-                    config.mysql_user,
-                    "%",
-                    engine_or_conn=conn,
-                )
-            Base.metadata.drop_all(conn) if self.is_test_mode else ...
-            Base.metadata.create_all(conn)
-            conn.commit()
+            statements = sync_schema(conn, Base.metadata, reset=self.is_test_mode)
         self.root_engine.dispose()
-        self.engine = create_async_engine(
-            database_url,
-            echo=config.db_echo,
-            pool_recycle=config.db_pool_recycle,
-            pool_pre_ping=True,
+        if statements is None:
+            SQLAlchemy.log("Schema fingerprint matched, DDL skipped")
+        else:
+            SQLAlchemy.log(f"Schema reconciled: {statements}")
+
+    def create_engines(
+        self,
+        database_url: str,
+        replica_database_urls: Sequence[str] = (),
+        replica_retry_interval: float = 30.0,
+        liveness_check_interval: Optional[float] = None,
+        **engine_kwargs: Any,
+    ) -> None:
+        self.engine = self._create_engine(
+            database_url, liveness_check_interval, **engine_kwargs
         )
-        self.session = async_scoped_session(
-            async_sessionmaker(
-                bind=self.engine, autocommit=False, autoflush=False, future=True
-            ),
-            scopefunc=current_task,
+        # Not expiring on commit, so that written instances need no reload, and
+        # instances returned earlier in a request are not lazy loaded (not in async)
+        self.session = async_sessionmaker(
+            bind=self.engine,
+            class_=ReadYourWritesSession,
+            autocommit=False,
+            autoflush=False,
+            expire_on_commit=False,
+            future=True,
         )
-        self.is_initiated = True
+        self.replica_router = (
+            ReplicaRouter(
+                engines=[
+                    self._create_engine(url, liveness_check_interval, **engine_kwargs)
+                    for url in replica_database_urls
+                ],
+                retry_interval=replica_retry_interval,
+            )
+            if replica_database_urls
+            else None
+        )
+
+    @staticmethod
+    def _create_engine(
+        url: str, liveness_check_interval: Optional[float], **engine_kwargs: Any
+    ) -> AsyncEngine:
+        engine: AsyncEngine = create_async_engine(url, **engine_kwargs)
+        if liveness_check_interval is not None:
+            install_liveness_check(engine, interval=liveness_check_interval)
+        install_query_stats(engine)
+        return engine
+
+    @property
+    def pool_stats(self) -> Dict[str, Any]:
+        def stats_of(engine: AsyncEngine) -> Optional[Dict[str, Any]]:
+            pool = engine.pool
+            return pool.stats if isinstance(pool, InstrumentedAsyncPool) else None
+
+        return {
+            "primary": stats_of(self.engine),
+            "replicas": [stats_of(engine) for engine in self.replica_router.engines]
+            if self.replica_router is not None
+            else [],
+        }
+
+    async def dispose_engines(self) -> None:
+        await self.engine.dispose()
+        if self.replica_router is not None:
+            for engine in self.replica_router.engines:
+                await engine.dispose()
+
+    @staticmethod
+    @contextmanager
+    def use_primary() -> Iterator[None]:
+        # Read-your-writes: reads in this block go to primary
+        token = read_from_primary.set(True)
+        try:
+            yield
+        finally:
+            read_from_primary.reset(token)
+
+    def pick_read_engine(self) -> Optional[AsyncEngine]:
+        if self.replica_router is None or read_from_primary.get():
+            return None
+        scope: Optional[RequestScope] = current_request_scope.get()
+        if scope is not None and scope.read_from_primary:
+            return None
+        return self.replica_router.pick()
+
+    @asynccontextmanager
+    async def request_scope(self) -> AsyncIterator[RequestScope]:
+        """
+        Shares one session among all DB calls in this block, e.g. a request.
+        A connection is checked out on the first call only, and is held across
+        commits until the block ends, when anything uncommitted is rolled back.
+        A session can't be used concurrently, so a DB call made while another task
+        uses it, e.g. under asyncio.gather, gets a private session instead.
+        """
+        scope = RequestScope()
+        token = current_request_scope.set(scope)
+        try:
+            yield scope
+        finally:
+            current_request_scope.reset(token)
+            scope.read_from_primary = False  # For tasks outliving the request
+            if scope.session is not None:
+                try:
+                    await scope.session.close()
+                finally:
+                    await scope.connection.close()
+
+    @asynccontextmanager
+    async def use_session(self) -> AsyncIterator[AsyncSession]:
+        # The request's session if in a request scope, otherwise a new one
+        scope: Optional[RequestScope] = current_request_scope.get()
+        if scope is None:
+            async with self.session() as transaction:
+                yield transaction
+            return
+        task: Optional[Task] = current_task()
+        if scope.depth and scope.user is not task:  # In use by a concurrent task
+            async with self.session() as transaction:
+                yield transaction
+            return
+        scope.user, scope.depth = task, scope.depth + 1
+        try:
+            if scope.session is None:
+                scope.connection = await self.engine.connect()
+                scope.session = self.session(bind=scope.connection)
+            try:
+                yield scope.session
+            except BaseException:
+                await scope.session.rollback()  # Left usable for the rest of it
+                raise
+        finally:
+            scope.depth -= 1
 
     async def get_db(self) -> AsyncSession:
-        async with self.session() as transaction:
+        async with self.use_session() as transaction:
             yield transaction
 
     def run_in_session(self, func: Callable[..., Any]) -> Callable[..., Any]:
@@ -237,26 +592,68 @@ class SQLAlchemy(metaclass=SingletonMetaClass):
             **kwargs: Any,
         ):
             if session is None:
-                async with self.session() as transaction:
+                async with self.use_session() as transaction:
                     result = await func(transaction, *args, **kwargs)
                     if autocommit:
                         await transaction.commit()
                     if refresh:
-                        [await transaction.refresh(r) for r in result] if isinstance(
-                            result, Iterable
-                        ) else await transaction.refresh(result)
+                        await self.refresh_all(transaction, result)
             else:
                 result = await func(session, *args, **kwargs)
                 if autocommit:
                     await session.commit()
                 if refresh:
-                    [await session.refresh(r) for r in result] if isinstance(
-                        result, Iterable
-                    ) else await session.refresh(result)
+                    await self.refresh_all(session, result)
             return result
 
         return wrapper
 
+    def run_in_read_session(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        async def wrapper(
+            session: Optional[AsyncSession] = None, *args: Any, **kwargs: Any
+        ):
+            if session is not None:
+                return await func(session, *args, **kwargs)
+            engine: Optional[AsyncEngine] = self.pick_read_engine()
+            if engine is not None:
+                try:
+                    async with self.replica_session(bind=engine) as transaction:
+                        return await func(transaction, *args, **kwargs)
+                except (InterfaceError, OperationalError, OSError):
+                    self.replica_router.mark_failed(engine)  # And retry on primary
+            async with self.use_session() as transaction:
+                return await func(transaction, *args, **kwargs)
+
+        return wrapper
+
+    @staticmethod
+    async def refresh_all(
+        session: AsyncSession, instances: Union[Base, Iterable[Base]]
+    ) -> None:
+        # Reloads instances with one SELECT ... WHERE id IN (...) per mapped class
+        instances = (
+            instances if isinstance(instances, (list, tuple, set)) else (instances,)
+        )
+        ids_by_mapper: Dict[Mapper, List[Any]] = {}
+        for instance in instances:
+            state = inspect(instance, raiseerr=False)
+            if state is None:
+                continue
+            if not state.persistent:  # As session.refresh does, e.g. if not flushed
+                raise InvalidRequestError(
+                    f"Instance {instance!r} is not persistent within this Session"
+                )
+            if len(state.mapper.primary_key) != 1:
+                await session.refresh(instance)
+                continue
+            ids_by_mapper.setdefault(state.mapper, []).append(state.identity[0])
+        for mapper, ids in ids_by_mapper.items():
+            await session.execute(
+                select(mapper)
+                .where(mapper.primary_key[0].in_(ids))
+                .execution_options(populate_existing=True)
+            )
+
     @staticmethod
     def log(msg) -> None:
         logging.critical(f"[{datetime.now()}] {msg}")
@@ -277,8 +674,17 @@ class SQLAlchemy(metaclass=SingletonMetaClass):
         self,
         session: AsyncSession,
         stmt: Select,
+        params: Optional[dict] = None,
     ) -> ScalarResult:
-        return await session.scalars(stmt)
+        return await session.scalars(stmt, params)
+
+    async def _rows(  # To be decorated
+        self,
+        session: AsyncSession,
+        stmt: Select,
+        params: Optional[dict] = None,
+    ) -> Result:
+        return await session.execute(stmt, params)
 
     async def _add(  # To be decorated
         self,
@@ -304,6 +710,134 @@ class SQLAlchemy(metaclass=SingletonMetaClass):
         await session.delete(instance)
         return instance
 
+    async def _bulk_insert(  # To be decorated
+        self,
+        session: AsyncSession,
+        table: Table,
+        chunks: AsyncIterator[List[dict]],
+        return_ids: bool,
+    ) -> Optional[List[int]]:
+        if not return_ids:
+            async for chunk in chunks:  # Core executemany, one multi-row INSERT
+                await session.execute(insert(table), chunk)
+            return None
+        ids: List[int] = []
+        dialect: Dialect = session.bind.dialect
+        connection: AsyncConnection = await session.connection()
+        id_increment: int = (
+            1
+            if dialect.insert_returning
+            else await connection.scalar(text("SELECT @@auto_increment_increment"))
+        )
+        keys: Optional[Tuple[str, ...]] = None
+        defaults: List[Column] = []
+        row_offset: int = 0
+        async for chunk in chunks:
+            if keys is None:  # All rows must have the keys of the first one
+                keys = tuple(chunk[0].keys())
+                # Filled here, as the statement runs on the driver
+                defaults = [
+                    column
+                    for column in table.columns
+                    if column.key not in keys
+                    and column.default is not None
+                    and (column.default.is_scalar or column.default.is_callable)
+                ]
+            for index, row in enumerate(chunk):
+                if row.keys() != set(keys):
+                    raise ValueError(
+                        f"Row {row_offset + index} has keys {sorted(row.keys())}, "
+                        f"but the first row has {sorted(keys)}"
+                    )
+            row_offset += len(chunk)
+            sql, positions = self._compile_multirow_insert(
+                table,
+                dialect=dialect,
+                keys=keys + tuple(column.key for column in defaults),
+                row_count=len(chunk),
+            )
+            rows: List[dict] = [
+                row
+                | {
+                    column.key: column.default.arg
+                    if column.default.is_scalar
+                    else column.default.arg(None)  # Per row, e.g. timestamps
+                    for column in defaults
+                }
+                for row in chunk
+            ]
+            result: CursorResult = await connection.exec_driver_sql(
+                sql, tuple(rows[index][key] for index, key in positions)
+            )
+            if dialect.insert_returning:
+                ids.extend(result.scalars().all())
+            else:
+                # MySQL assigns ids of a multi-row INSERT in one block, spaced by
+                # auto_increment_increment, and reports the first one
+                ids.extend(
+                    range(
+                        result.lastrowid,
+                        result.lastrowid + len(chunk) * id_increment,
+                        id_increment,
+                    )
+                )
+        return ids
+
+    def _compile_multirow_insert(
+        self, table: Table, dialect: Dialect, keys: Tuple[str, ...], row_count: int
+    ) -> Tuple[str, List[Tuple[int, str]]]:
+        # SQLAlchemy does not cache multi-row VALUES statements, and compiling one
+        # costs more than running it. So SQL is compiled once per shape here.
+        cache_key = (table.name, dialect.name, keys, row_count)
+        compiled_insert = self._multirow_inserts.get(cache_key)
+        if compiled_insert is None:
+            stmt = insert(table).values(
+                [
+                    {key: bindparam(f"{key}_{index}", required=False) for key in keys}
+                    for index in range(row_count)
+                ]
+            )
+            if dialect.insert_returning:
+                stmt = stmt.returning(table.primary_key.columns[0])
+            compiled = stmt.compile(dialect=dialect)
+            positions_by_name: Dict[str, Tuple[int, str]] = {
+                f"{key}_{index}": (index, key)
+                for index in range(row_count)
+                for key in keys
+            }
+            compiled_insert = self._multirow_inserts[cache_key] = (
+                compiled.string,
+                [positions_by_name[name] for name in compiled.positiontup],
+            )
+        return compiled_insert
+
+    async def _bulk_upsert(  # To be decorated
+        self,
+        session: AsyncSession,
+        table: Table,
+        chunks: AsyncIterator[List[dict]],
+        update_columns: Optional[Sequence[str]],
+    ) -> int:
+        row_count: int = 0
+        stmt = None
+        async for chunk in chunks:
+            if stmt is None:  # Built once, from keys of the first row by default
+                stmt = mysql_insert(table)
+                updated: dict = {
+                    column: stmt.inserted[column]
+                    for column in (
+                        update_columns
+                        if update_columns is not None
+                        else chunk[0].keys()
+                    )
+                    if not table.c[column].primary_key and column != "created_at"
+                }
+                if "updated_at" in table.c and "updated_at" not in updated:
+                    updated["updated_at"] = func.utc_timestamp()
+                stmt = stmt.on_duplicate_key_update(updated)
+            row_count += (await session.execute(stmt, chunk)).rowcount
+        return row_count
+
     async def execute(
         self,
         stmt: Union[text, Update, Delete, Select],
@@ -311,17 +845,17 @@ class SQLAlchemy(metaclass=SingletonMetaClass):
         refresh: bool = False,
         session: Optional[AsyncSession] = None,
     ) -> Result:
-        return await self.run_in_session(self._execute)(
+        return await self._execute_in_session(
             session, autocommit=autocommit, refresh=refresh, stmt=stmt
         )
 
     async def scalar(self, stmt: Select, session: Optional[AsyncSession] = None) -> Any:
-        return await self.run_in_session(self._scalar)(session, stmt=stmt)
+        return await self._scalar_in_session(session, stmt=stmt)
 
     async def scalars(
         self, stmt: Select, session: Optional[AsyncSession] = None
     ) -> ScalarResult:
-        return await self.run_in_session(self._scalars)(session, stmt=stmt)
+        return await self._scalars_in_session(session, stmt=stmt)
 
     async def add(
         self,
@@ -332,7 +866,7 @@ class SQLAlchemy(metaclass=SingletonMetaClass):
         **kwargs: Any,
     ) -> Base:
         instance = schema(**kwargs)
-        return await self.run_in_session(self._add)(
+        return await self._add_in_session(
             session, autocommit=autocommit, refresh=refresh, instance=instance
         )
 
@@ -345,7 +879,7 @@ class SQLAlchemy(metaclass=SingletonMetaClass):
         session: Optional[AsyncSession] = None,
     ) -> List[Base]:
         instances = [schema(**arg) for arg in args]
-        return await self.run_in_session(self._add_all)(
+        return await self._add_all_in_session(
             session, autocommit=autocommit, refresh=refresh, instances=instances
         )
 
@@ -355,28 +889,145 @@ class SQLAlchemy(metaclass=SingletonMetaClass):
         autocommit: bool = False,
         session: Optional[AsyncSession] = None,
     ) -> Base:
-        return await self.run_in_session(self._delete)(
+        return await self._delete_in_session(
             session, autocommit=autocommit, instance=instance
         )
 
+    async def bulk_insert(
+        self,
+        schema: Type[Base],
+        rows: Union[Iterable[dict], AsyncIterable[dict]],
+        chunk_size: int = 1000,
+        return_ids: bool = False,
+        autocommit: bool = False,
+        session: Optional[AsyncSession] = None,
+    ) -> Optional[List[int]]:
+        return await self._bulk_insert_in_session(
+            session,
+            autocommit=autocommit,
+            table=schema.__table__,
+            chunks=iterate_in_chunks(rows, chunk_size=chunk_size),
+            return_ids=return_ids,
+        )
+
+    async def bulk_upsert(
+        self,
+        schema: Type[Base],
+        rows: Union[Iterable[dict], AsyncIterable[dict]],
+        update_columns: Optional[Sequence[str]] = None,
+        chunk_size: int = 1000,
+        autocommit: bool = False,
+        session: Optional[AsyncSession] = None,
+    ) -> int:
+        return await self._bulk_upsert_in_session(
+            session,
+            autocommit=autocommit,
+            table=schema.__table__,
+            chunks=iterate_in_chunks(rows, chunk_size=chunk_size),
+            update_columns=update_columns,
+        )
+
+    def stream_scalars(
+        self,
+        stmt: Select,
+        batch_size: int = 1000,
+        session: Optional[AsyncSession] = None,
+    ) -> AsyncIterator[Any]:
+        return self._stream(stmt, batch_size, session, scalars=True)
+
+    def stream_rows(
+        self,
+        stmt: Select,
+        batch_size: int = 1000,
+        session: Optional[AsyncSession] = None,
+    ) -> AsyncIterator[Row]:
+        return self._stream(stmt, batch_size, session, scalars=False)
+
+    async def _stream(
+        self,
+        stmt: Select,
+        batch_size: int,
+        session: Optional[AsyncSession],
+        scalars: bool,
+    ) -> AsyncIterator[Any]:
+        # Server-side cursor, fetching `batch_size` rows at a time.
+        # Not on the request's session, whose connection it would tie up
+        stmt = stmt.execution_options(yield_per=batch_size)
+        if session is None:
+            engine: Optional[AsyncEngine] = self.pick_read_engine()
+            async with (
+                self.replica_session(bind=engine)
+                if engine is not None
+                else self.session()
+            ) as transaction:
+                try:
+                    result = await (
+                        transaction.stream_scalars(stmt)
+                        if scalars
+                        else transaction.stream(stmt)
+                    )
+                except (InterfaceError, OperationalError, OSError):
+                    if engine is not None:
+                        self.replica_router.mark_failed(engine)
+                    raise
+                async for item in result:
+                    yield item
+        else:
+            async for item in await (
+                session.stream_scalars(stmt) if scalars else session.stream(stmt)
+            ):
+                yield item
+
     async def scalars__fetchall(
-        self, stmt: Select, session: Optional[AsyncSession] = None
+        self,
+        stmt: Select,
+        session: Optional[AsyncSession] = None,
+        params: Optional[dict] = None,
     ) -> List[Base]:
-        return (await self.run_in_session(self._scalars)(session, stmt=stmt)).fetchall()
+        return (
+            await self._scalars_in_session(session, stmt=stmt, params=params)
+        ).fetchall()
 
     async def scalars__one(
-        self, stmt: Select, session: Optional[AsyncSession] = None
+        self,
+        stmt: Select,
+        session: Optional[AsyncSession] = None,
+        params: Optional[dict] = None,
     ) -> Base:
-        return (await self.run_in_session(self._scalars)(session, stmt=stmt)).one()
+        return (await self._scalars_in_session(session, stmt=stmt, params=params)).one()
 
     async def scalars__first(
-        self, stmt: Select, session: Optional[AsyncSession] = None
+        self,
+        stmt: Select,
+        session: Optional[AsyncSession] = None,
+        params: Optional[dict] = None,
     ) -> Base:
-        return (await self.run_in_session(self._scalars)(session, stmt=stmt)).first()
+        return (
+            await self._scalars_in_session(session, stmt=stmt, params=params)
+        ).first()
 
     async def scalars__one_or_none(
-        self, stmt: Select, session: Optional[AsyncSession] = None
+        self,
+        stmt: Select,
+        session: Optional[AsyncSession] = None,
+        params: Optional[dict] = None,
     ) -> Optional[Base]:
         return (
-            await self.run_in_session(self._scalars)(session, stmt=stmt)
+            await self._scalars_in_session(session, stmt=stmt, params=params)
         ).one_or_none()
+
+    async def rows__fetchall(
+        self,
+        stmt: Select,
+        session: Optional[AsyncSession] = None,
+        params: Optional[dict] = None,
+    ) -> List[Row]:
+        return (await self._rows_in_session(session, stmt=stmt, params=params)).all()
+
+    async def rows__first(
+        self,
+        stmt: Select,
+        session: Optional[AsyncSession] = None,
+        params: Optional[dict] = None,
+    ) -> Optional[Row]:
+        return (await self._rows_in_session(session, stmt=stmt, params=params)).first()
@@ -1,6 +1,8 @@
-from typing import Optional, Tuple, List
-from sqlalchemy import select, func, exists
-from app.models import AddApiKey
+from functools import partial
+from typing import AsyncIterator, FrozenSet, NamedTuple, Optional, Tuple, List
+from sqlalchemy import Row, delete, select, func, exists
+from sqlalchemy.exc import IntegrityError
+from app.models import AddApiKey, UserToken
 from app.errors.exceptions import (
     MaxKeyCountEx,
     MaxWLCountEx,
@@ -8,42 +10,144 @@ from app.errors.exceptions import (
     NotFoundUserEx,
     NotFoundAccessKeyEx,
 )
-from app.common.config import MAX_API_KEY, MAX_API_WHITELIST
+from app.common.config import Config, MAX_API_KEY, MAX_API_WHITELIST
+from app.database.access_key_filter import access_key_filter
 from app.database.schema import db, Users, ApiKeys, ApiWhiteLists
+from app.database.single_flight import single_flight
+from app.utils.cache_utils import StatsTTLCache
 from app.utils.encoding_and_hashing import generate_api_key
 
 # from sqlalchemy.ext.asyncio import AsyncSession
 
 
+class ApiKeyRecord(NamedTuple):
+    # Columns of an API key that access control needs
+    id: int
+    user_id: int
+    access_key: str
+    secret_key: str
+    is_whitelisted: bool
+    rate_limit: Optional[float]
+    rate_burst: Optional[int]
+
+
+class ResolvedApiKey(NamedTuple):
+    api_key: ApiKeyRecord
+    owner: UserToken
+    whitelist_ips: FrozenSet[str]
+
+
+# Columns of read-only responses, selected as rows instead of ORM instances
+USER_ME_COLUMNS: Tuple[str, ...] = (
+    "id",
+    "email",
+    "name",
+    "phone_number",
+    "profile_img",
+)
+API_KEY_LIST_COLUMNS: Tuple[str, ...] = ("id", "access_key", "user_memo", "created_at")
+WHITELIST_COLUMNS: Tuple[str, ...] = ("id", "ip_address")
+
+
+config = Config.get()
+MAX_INSERT_ATTEMPTS: int = 3  # Of a random unique key, before giving up
+api_key_cache: StatsTTLCache = StatsTTLCache(
+    maxsize=config.api_key_cache_maxsize, ttl=config.api_key_cache_ttl
+)  # access_key -> ResolvedApiKey, per process, bounded by TTL across workers
+# Bumped on every invalidation, so that lookups started before one aren't cached
+api_key_cache_generation: int = 0
+
+
+def invalidate_api_key_cache(
+    access_key: Optional[str] = None, api_key_id: Optional[int] = None
+) -> None:
+    # Of this worker only. Other workers may serve the old key until their TTL
+    global api_key_cache_generation
+    api_key_cache_generation += 1
+    if access_key is not None:
+        api_key_cache.pop(access_key, None)
+    if api_key_id is not None:
+        for cached_access_key, resolved in list(api_key_cache.items()):
+            if resolved.api_key.id == api_key_id:
+                api_key_cache.pop(cached_access_key, None)
+
+
 async def is_email_exist(email: str) -> bool:
     return (
         True if await db.scalar(select(exists().where(Users.email == email))) else False
     )
 
 
-async def get_me(user_id: int):
-    return await Users.first_filtered_by(id=user_id)
+async def get_me(user_id: int) -> Optional[Row]:
+    return await single_flight.do(
+        ("get_me", user_id),
+        partial(Users.first_row_filtered_by, *USER_ME_COLUMNS, id=user_id),
+    )
 
 
-async def get_api_key_and_owner(access_key: str) -> Tuple[ApiKeys, Users]:
-    async with db.session() as transaction:
-        matched_api_key: Optional[ApiKeys] = await transaction.scalar(
-            select(ApiKeys).filter_by(access_key=access_key)
-        )
-        if matched_api_key is None:
-            raise NotFoundAccessKeyEx(api_key=access_key)
-        api_key_owner: Optional[Users] = await transaction.scalar(
-            select(Users).filter_by(id=matched_api_key.user_id)
+async def resolve_api_key(access_key: str) -> ResolvedApiKey:
+    cached: Optional[ResolvedApiKey] = api_key_cache.get(access_key)
+    if cached is not None:
+        return cached
+    # Lookups in flight since before an invalidation are not joined
+    generation: int = api_key_cache_generation
+    return await single_flight.do(
+        ("resolve_api_key", access_key, generation),
+        partial(_query_api_key, access_key, generation),
+    )
+
+
+async def _query_api_key(access_key: str, generation: int) -> ResolvedApiKey:
+    if not await access_key_filter.might_exist(access_key):
+        raise NotFoundAccessKeyEx(api_key=access_key)
+    stmt = (
+        select(
+            *(ApiKeys.__table__.c[column] for column in ApiKeyRecord._fields),
+            Users.id,
+            Users.email,
+            Users.name,
+            Users.phone_number,
+            Users.profile_img,
+            ApiWhiteLists.ip_address,
         )
-        if api_key_owner is None:
-            raise NotFoundUserEx(user_id=matched_api_key.user_id)
-        return matched_api_key, api_key_owner
+        .outerjoin(Users, Users.id == ApiKeys.user_id)
+        .outerjoin(ApiWhiteLists, ApiWhiteLists.api_key_id == ApiKeys.id)
+        .filter(ApiKeys.access_key == access_key)
+    )  # One round trip: a row per whitelist entry, or a single row without any
+    rows = (await db.execute(stmt)).all()
+    if not rows:
+        access_key_filter.record_not_found(access_key)
+        raise NotFoundAccessKeyEx(api_key=access_key)
+    matched_api_key = ApiKeyRecord(*rows[0][: len(ApiKeyRecord._fields)])
+    user_id, email, name, phone_number, profile_img, _ = rows[0][
+        len(ApiKeyRecord._fields) :
+    ]
+    if user_id is None:
+        raise NotFoundUserEx(user_id=matched_api_key.user_id)
+    resolved = ResolvedApiKey(
+        api_key=matched_api_key,
+        owner=UserToken(
+            id=user_id,
+            email=email,
+            name=name,
+            phone_number=phone_number,
+            profile_img=profile_img,
+        ),
+        whitelist_ips=frozenset(row[-1] for row in rows if row[-1] is not None),
+    )
+    if generation == api_key_cache_generation:  # Else possibly read before it
+        api_key_cache[access_key] = resolved
+    return resolved
+
+
+async def get_api_key_and_owner(access_key: str) -> Tuple[ApiKeyRecord, UserToken]:
+    resolved: ResolvedApiKey = await resolve_api_key(access_key=access_key)
+    return resolved.api_key, resolved.owner
 
 
 async def register_new_user(email: str, hashed_password: str, ip_address: str) -> Users:
     return await Users.add_one(
         autocommit=True,
-        refresh=True,
         email=email,
         password=hashed_password,
         ip_address=ip_address,
@@ -55,37 +159,45 @@ async def find_matched_user(email: str) -> Users:
 
 
 async def create_api_key(user_id: int, additional_key_info: AddApiKey) -> ApiKeys:
-    async with db.session() as transaction:
+    async with db.use_session() as transaction:
         api_key_count_stmt = select(func.count(ApiKeys.id)).filter_by(user_id=user_id)
         api_key_count: int = await transaction.scalar(api_key_count_stmt)
         if api_key_count >= MAX_API_KEY:
             raise MaxKeyCountEx()
-        while True:
+        for attempts_left in reversed(range(MAX_INSERT_ATTEMPTS)):
             new_api_key: ApiKeys = await generate_api_key(
                 user_id=user_id, additional_key_info=additional_key_info
             )
-            is_api_key_duplicate_stmt = select(
-                exists().where(ApiKeys.access_key == new_api_key.access_key)
-            )
-            is_api_key_duplicate: bool = await transaction.scalar(
-                is_api_key_duplicate_stmt
-            )
-            if not is_api_key_duplicate:
+            transaction.add(new_api_key)
+            try:
+                await transaction.commit()
                 break
-        transaction.add(new_api_key)
-        await transaction.commit()
-        await transaction.refresh(new_api_key)
+            except IntegrityError:  # Access key taken, as it is unique
+                await transaction.rollback()
+                if not attempts_left:
+                    raise
+        access_key_filter.add(new_api_key.access_key)
         return new_api_key
 
 
-async def get_api_keys(user_id: int) -> List[ApiKeys]:
-    return await ApiKeys.fetchall_filtered_by(user_id=user_id)
+async def get_api_keys(user_id: int) -> List[Row]:
+    return await ApiKeys.fetchall_rows_filtered_by(
+        *API_KEY_LIST_COLUMNS, user_id=user_id
+    )
+
+
+def stream_api_keys(
+    user_id: int, cursor: Optional[int] = None, limit: Optional[int] = None
+) -> AsyncIterator[Row]:
+    return ApiKeys.stream_rows_filtered_by(
+        *API_KEY_LIST_COLUMNS, cursor=cursor, limit=limit, user_id=user_id
+    )
 
 
 async def update_api_key(
     updated_key_info: dict, access_key_id: int, user_id: int
 ) -> ApiKeys:
-    async with db.session() as transaction:
+    async with db.use_session() as transaction:
         matched_api_key: Optional[ApiKeys] = await transaction.scalar(
             select(ApiKeys).filter_by(id=access_key_id, user_id=user_id)
         )
@@ -94,60 +206,93 @@ async def update_api_key(
         matched_api_key.set_values_as(**updated_key_info)
         transaction.add(matched_api_key)
         await transaction.commit()
-        await transaction.refresh(matched_api_key)
+        invalidate_api_key_cache(access_key=matched_api_key.access_key)
         return matched_api_key
 
 
 async def delete_api_key(access_key_id: int, access_key: str, user_id: int) -> None:
-    async with db.session() as transaction:
-        matched_api_key: Optional[ApiKeys] = await transaction.scalar(
-            select(ApiKeys).filter_by(
-                id=access_key_id, user_id=user_id, access_key=access_key
+    async with db.use_session() as transaction:
+        matched_key_filter = {
+            "id": access_key_id,
+            "user_id": user_id,
+            "access_key": access_key,
+        }
+        # Core deletes: the ORM cascade would load the whitelists first.
+        # Not synchronizing the session, which would SELECT first without RETURNING
+        await transaction.execute(
+            delete(ApiWhiteLists)
+            .where(
+                ApiWhiteLists.api_key_id.in_(
+                    select(ApiKeys.id).filter_by(**matched_key_filter)
+                )
             )
+            .execution_options(synchronize_session=False)
         )
-        if matched_api_key is None:
+        result = await transaction.execute(
+            delete(ApiKeys)
+            .filter_by(**matched_key_filter)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
             raise NotFoundAccessKeyEx(api_key=access_key)
-        await transaction.delete(matched_api_key)
         await transaction.commit()
+        invalidate_api_key_cache(access_key=access_key)
+        access_key_filter.discard(access_key)
 
 
 async def create_api_key_whitelist(ip_address: str, api_key_id: int) -> ApiWhiteLists:
-    async with db.session() as transaction:
-        whitelist_count_stmt = select(func.count(ApiWhiteLists.id)).filter_by(
-            api_key_id=api_key_id
-        )
-        whitelist_count: int = await transaction.scalar(whitelist_count_stmt)
-        if whitelist_count >= MAX_API_WHITELIST:
+    async with db.use_session() as transaction:
+        # At most MAX_API_WHITELIST rows: counted and checked for the ip at once
+        whitelists: List[ApiWhiteLists] = (
+            await transaction.scalars(
+                select(ApiWhiteLists).filter_by(api_key_id=api_key_id)
+            )
+        ).all()
+        if len(whitelists) >= MAX_API_WHITELIST:
             raise MaxWLCountEx()
-        ip_duplicated_whitelist_stmt = select(ApiWhiteLists).filter_by(
-            api_key_id=api_key_id, ip_address=ip_address
-        )
-        ip_duplicated_whitelist = await transaction.scalar(ip_duplicated_whitelist_stmt)
-        if ip_duplicated_whitelist is not None:
-            return ip_duplicated_whitelist
+        for whitelist in whitelists:
+            if whitelist.ip_address == ip_address:
+                return whitelist
         new_whitelist = ApiWhiteLists(api_key_id=api_key_id, ip_address=ip_address)
         transaction.add(new_whitelist)
-        await transaction.commit()
-        await transaction.refresh(new_whitelist)
+        try:
+            await transaction.commit()
+        except IntegrityError:  # Added concurrently, as (api_key_id, ip) is unique
+            await transaction.rollback()
+            return await transaction.scalar(
+                select(ApiWhiteLists).filter_by(
+                    api_key_id=api_key_id, ip_address=ip_address
+                )
+            )
+        invalidate_api_key_cache(api_key_id=api_key_id)
         return new_whitelist
 
 
-async def get_api_key_whitelist(api_key_id: int) -> List[ApiKeys]:
-    return await ApiWhiteLists.fetchall_filtered_by(api_key_id=api_key_id)
+async def get_api_key_whitelist(api_key_id: int) -> List[Row]:
+    return await ApiWhiteLists.fetchall_rows_filtered_by(
+        *WHITELIST_COLUMNS, api_key_id=api_key_id
+    )
+
+
+def stream_api_key_whitelist(
+    api_key_id: int, cursor: Optional[int] = None, limit: Optional[int] = None
+) -> AsyncIterator[Row]:
+    return ApiWhiteLists.stream_rows_filtered_by(
+        *WHITELIST_COLUMNS, cursor=cursor, limit=limit, api_key_id=api_key_id
+    )
 
 
 async def delete_api_key_whitelist(
     user_id: int, api_key_id: int, whitelist_id: int
 ) -> None:
-    async with db.session() as transaction:
-        matched_api_key: Optional[ApiKeys] = await transaction.scalar(
-            select(ApiKeys).filter_by(id=api_key_id, user_id=user_id)
-        )
-        if matched_api_key is None:
+    async with db.use_session() as transaction:
+        result = await transaction.execute(
+            delete(ApiWhiteLists)
+            .filter_by(id=whitelist_id, api_key_id=api_key_id)
+            .where(exists().where(ApiKeys.id == api_key_id, ApiKeys.user_id == user_id))
+            .execution_options(synchronize_session=False)
+        )  # Only from a key of the user
+        if result.rowcount == 0:
             raise NoKeyMatchEx()
-        matched_whitelist_stmt = select(ApiWhiteLists).filter_by(
-            id=whitelist_id, api_key_id=api_key_id
-        )
-        matched_whitelist = await transaction.scalar(matched_whitelist_stmt)
-        await transaction.delete(matched_whitelist)
         await transaction.commit()
+        invalidate_api_key_cache(api_key_id=api_key_id)
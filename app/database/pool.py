@@ -0,0 +1,105 @@
+from bisect import bisect_left
+from time import monotonic, perf_counter
+from typing import Any, Dict, List, Tuple
+from sqlalchemy import event
+from sqlalchemy.exc import DisconnectionError, TimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram of latencies in milliseconds"""
+
+    bounds: Tuple[float, ...] = (0.1, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+    def __init__(self) -> None:
+        self.counts: List[int] = [0] * (len(self.bounds) + 1)
+        self.count: int = 0
+        self.total: float = 0.0
+        self.max: float = 0.0
+
+    def observe(self, milliseconds: float) -> None:
+        self.counts[bisect_left(self.bounds, milliseconds)] += 1
+        self.count += 1
+        self.total += milliseconds
+        self.max = max(self.max, milliseconds)
+
+    def quantile(self, q: float) -> float:
+        # Upper bound of the bucket holding the q-th observation
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.quantile(0.5) if self.count else 0.0,
+            "p99_ms": self.quantile(0.99) if self.count else 0.0,
+            "max_ms": round(self.max, 3),
+            "buckets": {
+                f"le_{bound}": count for bound, count in zip(self.bounds, self.counts)
+            }
+            | {"inf": self.counts[-1]},
+        }
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """
+    Queue pool recording how long each checkout waited for a connection,
+    including connecting when the pool had to open a new one.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.checkout_wait = LatencyHistogram()
+        self.checkout_timeouts: int = 0
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        start = perf_counter()
+        try:
+            return super()._do_get()
+        except TimeoutError:
+            self.checkout_timeouts += 1
+            raise
+        finally:
+            self.checkout_wait.observe((perf_counter() - start) * 1000)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pool_size": self.size(),
+            "checked_out": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "checkout_timeouts": self.checkout_timeouts,
+            "checkout_wait": self.checkout_wait.stats,
+        }
+
+
+def install_liveness_check(engine: AsyncEngine, interval: float) -> None:
+    """
+    Instead of pinging on every checkout (pool_pre_ping), pings only connections
+    that sat idle in the pool for longer than `interval` seconds.
+    """
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "connect")
+    @event.listens_for(sync_engine, "checkin")
+    def stamp(dbapi_connection: Any, connection_record: Any) -> None:
+        connection_record.info["idle_since"] = monotonic()
+
+    @event.listens_for(sync_engine, "checkout")
+    def check(dbapi_connection: Any, connection_record: Any, proxy: Any) -> None:
+        idle_since: float = connection_record.info.get("idle_since", 0.0)
+        if monotonic() - idle_since <= interval:
+            return
+        try:
+            sync_engine.dialect.do_ping(dbapi_connection)
+        except Exception as exception:
+            # The pool discards this connection and checks out another one
+            raise DisconnectionError() from exception
@@ -0,0 +1,85 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Any, Dict, Iterator, List, Optional
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+class QueryStats:
+    """
+    Statements issued in a context (e.g. a request): count, total DB time and
+    the slowest one. A SELECT issued `n_plus_one_threshold` times or more with the
+    same SQL is reported as a likely N+1. Observations also go to the stats
+    of the enclosing context, if any.
+    """
+
+    def __init__(
+        self, n_plus_one_threshold: int = 5, parent: Optional["QueryStats"] = None
+    ) -> None:
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.parent = parent
+        self.count: int = 0
+        self.total_ms: float = 0.0
+        self.slowest_ms: float = 0.0
+        self.slowest: Optional[str] = None
+        self.statements: Counter = Counter()
+
+    def observe(self, statement: str, milliseconds: float) -> None:
+        self.count += 1
+        self.total_ms += milliseconds
+        self.statements[statement] += 1
+        if milliseconds > self.slowest_ms:
+            self.slowest_ms, self.slowest = milliseconds, statement
+        if self.parent is not None:
+            self.parent.observe(statement, milliseconds)
+
+    @property
+    def n_plus_one(self) -> List[str]:
+        return [
+            statement
+            for statement, count in self.statements.items()
+            if count >= self.n_plus_one_threshold
+            and statement.lstrip().upper().startswith("SELECT")
+        ]
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "totalTime": str(round(self.total_ms, 5)) + "ms",
+            "slowestTime": str(round(self.slowest_ms, 5)) + "ms",
+            "slowest": self.slowest,
+            "nPlusOne": self.n_plus_one,
+        }
+
+
+query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries(n_plus_one_threshold: int = 5) -> Iterator[QueryStats]:
+    stats = QueryStats(n_plus_one_threshold, parent=query_stats.get())
+    token = query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        query_stats.reset(token)
+
+
+def install_query_stats(engine: AsyncEngine) -> None:
+    # Sync events run in the greenlet of the awaiting task, which sees its context
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def start(conn, cursor, statement, parameters, context, executemany) -> None:
+        if query_stats.get() is not None:
+            context.query_started_at = perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def stop(conn, cursor, statement, parameters, context, executemany) -> None:
+        stats: Optional[QueryStats] = query_stats.get()
+        started_at: Optional[float] = getattr(context, "query_started_at", None)
+        if stats is not None and started_at is not None:
+            stats.observe(statement, (perf_counter() - started_at) * 1000)
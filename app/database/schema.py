@@ -1,13 +1,18 @@
-from typing import Optional, List
+from collections.abc import AsyncIterable, Iterable
+from typing import AsyncIterator, Dict, Optional, List, Sequence, Union
 from sqlalchemy import (
+    CheckConstraint,
     Column,
-    func,
+    Row,
     String,
+    UniqueConstraint,
     Integer,
     Enum,
     Boolean,
     ForeignKey,
+    Index,
     Select,
+    bindparam,
     select,
     update,
 )
@@ -20,19 +25,28 @@ from sqlalchemy.orm import (
 )
 from datetime import datetime
 from app.database.connection import Base, SQLAlchemy
-from app.common.config import Config
 
 db = SQLAlchemy()
+# (model, sorted filter columns, method, selected columns) -> statement with binds
+filtered_by_statements: Dict[
+    Tuple[type, Tuple[str, ...], str, Tuple[str, ...]], Select
+] = {}
+# Rows enough for first() / one() / one_or_none() to give the same result
+ROW_LIMITS: Dict[str, int] = {"first": 1, "one": 2, "one_or_none": 2}
+
+
+def utc_now() -> datetime:
+    return datetime.utcnow().replace(microsecond=0)  # As stored in DATETIME
+
+
 # ========================== Schema section begins ==========================
 
 
 class Mixin:
     id: Mapped[int] = mapped_column(primary_key=True)
-    created_at: Mapped[datetime] = mapped_column(default=func.utc_timestamp())
-    updated_at: Mapped[datetime] = mapped_column(
-        default=func.utc_timestamp(),
-        onupdate=func.utc_timestamp(),
-    )
+    # Python-side defaults, known after INSERT / UPDATE without fetching them back
+    created_at: Mapped[datetime] = mapped_column(default=utc_now)
+    updated_at: Mapped[datetime] = mapped_column(default=utc_now, onupdate=utc_now)
     ip_address: Mapped[Optional[str]] = mapped_column(String(length=40))
 
     def set_values_as(self, **kwargs):
@@ -59,6 +73,52 @@ class Mixin:
             cls, *args, autocommit=autocommit, refresh=refresh, session=session
         )
 
+    @classmethod
+    async def bulk_insert(
+        cls,
+        rows: Union[Iterable[dict], AsyncIterable[dict]],
+        chunk_size: int = 1000,
+        return_ids: bool = False,
+        autocommit: bool = False,
+        session: Optional[AsyncSession] = None,
+    ) -> Optional[List[int]]:
+        """
+        Inserts rows with Core executemany in chunks, skipping the unit of work.
+        Rows of a chunk must have the same keys. Returns ids if `return_ids`,
+        in which case values are passed to the driver without type processing.
+        """
+        return await db.bulk_insert(
+            cls,
+            rows,
+            chunk_size=chunk_size,
+            return_ids=return_ids,
+            autocommit=autocommit,
+            session=session,
+        )
+
+    @classmethod
+    async def bulk_upsert(
+        cls,
+        rows: Union[Iterable[dict], AsyncIterable[dict]],
+        update_columns: Optional[Sequence[str]] = None,
+        chunk_size: int = 1000,
+        autocommit: bool = False,
+        session: Optional[AsyncSession] = None,
+    ) -> int:
+        """
+        INSERT ... ON DUPLICATE KEY UPDATE in chunks (MySQL).
+        Updates `update_columns`, or every given column but id and created_at.
+        Returns affected rows, counted by MySQL as 1 per insert and 2 per update.
+        """
+        return await db.bulk_upsert(
+            cls,
+            rows,
+            update_columns=update_columns,
+            chunk_size=chunk_size,
+            autocommit=autocommit,
+            session=session,
+        )
+
     @classmethod
     async def add_one(
         cls,
@@ -81,37 +141,136 @@ class Mixin:
         session: Optional[AsyncSession] = None,
     ) -> Base:
         stmt = update(cls).filter_by(**filter_by).values(**updated)
-        return await db.run_in_session(db._execute)(
-            session, autocommit=autocommit, refresh=refresh, stmt=stmt
+        return await db.execute(
+            stmt, autocommit=autocommit, refresh=refresh, session=session
+        )
+
+    @classmethod
+    def _entities(cls, columns: Tuple[str, ...]) -> Tuple[Any, ...]:
+        # Table columns select plain rows: no ORM instances nor identity map
+        return tuple(cls.__table__.c[column] for column in columns) or (cls,)
+
+    @classmethod
+    def keyset_select(
+        cls,
+        *columns: str,
+        cursor: Optional[int] = None,
+        limit: Optional[int] = None,
+        **kwargs: Any,
+    ) -> Select[Tuple]:
+        # Keyset pagination: next page starts after the last id of the previous one
+        stmt: Select[Tuple] = (
+            select(*cls._entities(columns)).filter_by(**kwargs).order_by(cls.id)
+        )
+        if cursor is not None:
+            stmt = stmt.filter(cls.id > cursor)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        return stmt
+
+    @classmethod
+    async def fetch_page_filtered_by(
+        cls,
+        cursor: Optional[int] = None,
+        limit: int = 100,
+        session: Optional[AsyncSession] = None,
+        **kwargs: Any,
+    ) -> List[Base]:
+        stmt: Select[Tuple] = cls.keyset_select(cursor=cursor, limit=limit, **kwargs)
+        return await db.scalars__fetchall(stmt=stmt, session=session)
+
+    @classmethod
+    def stream_filtered_by(
+        cls,
+        cursor: Optional[int] = None,
+        limit: Optional[int] = None,
+        batch_size: int = 1000,
+        session: Optional[AsyncSession] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[Base]:
+        stmt: Select[Tuple] = cls.keyset_select(cursor=cursor, limit=limit, **kwargs)
+        return db.stream_scalars(stmt=stmt, batch_size=batch_size, session=session)
+
+    @classmethod
+    def stream_rows_filtered_by(
+        cls,
+        *columns: str,
+        cursor: Optional[int] = None,
+        limit: Optional[int] = None,
+        batch_size: int = 1000,
+        session: Optional[AsyncSession] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[Row]:
+        stmt: Select[Tuple] = cls.keyset_select(
+            *columns, cursor=cursor, limit=limit, **kwargs
         )
+        return db.stream_rows(stmt=stmt, batch_size=batch_size, session=session)
+
+    @classmethod
+    def _select_filtered_by(
+        cls, method: str, columns: Tuple[str, ...] = (), **kwargs: Any
+    ) -> Tuple[Select[Tuple], Optional[dict]]:
+        row_limit: Optional[int] = ROW_LIMITS.get(method)
+        if any(value is None for value in kwargs.values()):
+            # Only a literal None renders as IS NULL, so these are built every time
+            stmt: Select[Tuple] = select(*cls._entities(columns)).filter_by(**kwargs)
+            return (stmt.limit(row_limit) if row_limit else stmt), None
+        cache_key = (cls, tuple(sorted(kwargs)), method, columns)
+        stmt: Optional[Select[Tuple]] = filtered_by_statements.get(cache_key)
+        if stmt is None:
+            stmt = select(*cls._entities(columns)).filter_by(
+                **{column: bindparam(f"filter_{column}") for column in cache_key[1]}
+            )
+            if row_limit:
+                stmt = stmt.limit(row_limit)
+            filtered_by_statements[cache_key] = stmt
+        return stmt, {f"filter_{column}": value for column, value in kwargs.items()}
 
     @classmethod
     async def fetchall_filtered_by(
         cls, session: Optional[AsyncSession] = None, **kwargs: Any
     ) -> List[Base]:
-        stmt: Select[Tuple] = select(cls).filter_by(**kwargs)
-        return await db.scalars__fetchall(stmt=stmt, session=session)
+        stmt, params = cls._select_filtered_by("fetchall", **kwargs)
+        return await db.scalars__fetchall(stmt=stmt, session=session, params=params)
 
     @classmethod
     async def one_filtered_by(
         cls, session: Optional[AsyncSession] = None, **kwargs: Any
     ) -> Base:
-        stmt: Select[Tuple] = select(cls).filter_by(**kwargs)
-        return await db.scalars__one(stmt=stmt, session=session)
+        stmt, params = cls._select_filtered_by("one", **kwargs)
+        return await db.scalars__one(stmt=stmt, session=session, params=params)
 
     @classmethod
     async def first_filtered_by(
         cls, session: Optional[AsyncSession] = None, **kwargs: Any
     ) -> Base:
-        stmt: Select[Tuple] = select(cls).filter_by(**kwargs)
-        return await db.scalars__first(stmt=stmt, session=session)
+        stmt, params = cls._select_filtered_by("first", **kwargs)
+        return await db.scalars__first(stmt=stmt, session=session, params=params)
 
     @classmethod
     async def one_or_none_filtered_by(
         cls, session: Optional[AsyncSession] = None, **kwargs: Any
     ) -> Optional[Base]:
-        stmt: Select[Tuple] = select(cls).filter_by(**kwargs)
-        return await db.scalars__one_or_none(stmt=stmt, session=session)
+        stmt, params = cls._select_filtered_by("one_or_none", **kwargs)
+        return await db.scalars__one_or_none(stmt=stmt, session=session, params=params)
+
+    @classmethod
+    async def fetchall_rows_filtered_by(
+        cls, *columns: str, session: Optional[AsyncSession] = None, **kwargs: Any
+    ) -> List[Row]:
+        """
+        Like fetchall_filtered_by, but rows of `columns` only, without ORM instances.
+        For read-only paths, where instances would only be converted and dropped.
+        """
+        stmt, params = cls._select_filtered_by("fetchall", columns, **kwargs)
+        return await db.rows__fetchall(stmt=stmt, session=session, params=params)
+
+    @classmethod
+    async def first_row_filtered_by(
+        cls, *columns: str, session: Optional[AsyncSession] = None, **kwargs: Any
+    ) -> Optional[Row]:
+        stmt, params = cls._select_filtered_by("first", columns, **kwargs)
+        return await db.rows__first(stmt=stmt, session=session, params=params)
 
     @classmethod
     async def fetchall_filtered(
@@ -147,7 +306,7 @@ class Users(Base, Mixin):
     status: Mapped[str] = mapped_column(
         Enum("active", "deleted", "blocked"), default="active"
     )
-    email: Mapped[str] = mapped_column(String(length=20))
+    email: Mapped[str] = mapped_column(String(length=20), index=True, unique=True)
     password: Mapped[Optional[str]] = mapped_column(String(length=72))
     name: Mapped[Optional[str]] = mapped_column(String(length=20))
     phone_number: Mapped[Optional[str]] = mapped_column(String(length=20))
@@ -160,6 +319,15 @@ class Users(Base, Mixin):
 
 class ApiKeys(Base, Mixin):
     __tablename__ = "api_keys"
+    __table_args__ = (  # A rate of 0 blocks the key, see SharedTokenBucketTable
+        CheckConstraint(
+            "rate_limit IS NULL OR rate_limit >= 0", name="ck_api_keys_rate_limit"
+        ),
+        CheckConstraint(
+            "rate_burst IS NULL OR rate_burst >= 1", name="ck_api_keys_rate_burst"
+        ),
+        Index("ix_api_keys_created_at", "created_at"),  # Access key filter refresh
+    )
     status: Mapped[str] = mapped_column(
         Enum("active", "stopped", "deleted"), default="active"
     )
@@ -167,7 +335,9 @@ class ApiKeys(Base, Mixin):
     secret_key: Mapped[str] = mapped_column(String(length=64))
     user_memo: Mapped[Optional[str]] = mapped_column(String(length=40))
     is_whitelisted: Mapped[bool] = mapped_column(default=False)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    rate_limit: Mapped[Optional[float]] = mapped_column()  # None: Config default
+    rate_burst: Mapped[Optional[int]] = mapped_column()
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
     users: Mapped["Users"] = relationship(back_populates="api_keys")
     whitelists: Mapped["ApiWhiteLists"] = relationship(
         backref="api_keys", cascade="all, delete-orphan"
@@ -176,6 +346,11 @@ class ApiKeys(Base, Mixin):
 
 class ApiWhiteLists(Base, Mixin):
     __tablename__ = "api_whitelists"
+    __table_args__ = (  # Also serves lookups by api_key_id alone
+        UniqueConstraint(
+            "api_key_id", "ip_address", name="uq_api_whitelists_api_key_id_ip_address"
+        ),
+    )
     api_key_id: Mapped[int] = Column(Integer, ForeignKey("api_keys.id"))
     ip_address: Mapped[str] = Column(String(length=64))
 
@@ -186,4 +361,3 @@ class Debugging(Base):
 
 
 # ========================== Schema section ends ==========================
-db.init(config=Config.get())
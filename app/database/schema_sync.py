@@ -0,0 +1,137 @@
+from hashlib import sha256
+from typing import List, Optional
+from sqlalchemy import (
+    CheckConstraint,
+    Column,
+    DateTime,
+    MetaData,
+    String,
+    Table,
+    UniqueConstraint,
+    func,
+    inspect,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.engine.base import Connection
+from sqlalchemy.engine.interfaces import Dialect
+from sqlalchemy.schema import AddConstraint, CreateColumn, CreateIndex, CreateTable
+
+# Kept out of Base.metadata, so that it is not part of its own fingerprint
+schema_fingerprints = Table(
+    "schema_fingerprints",
+    MetaData(),
+    Column("name", String(length=40), primary_key=True),
+    Column("fingerprint", String(length=64), nullable=False),
+    Column("updated_at", DateTime, server_default=func.now(), onupdate=func.now()),
+)
+
+
+def fingerprint(metadata: MetaData, dialect: Dialect) -> str:
+    # Hash of the DDL that create_all would emit for the declared schema
+    digest = sha256()
+    for table in metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for index in sorted(table.indexes, key=lambda index: index.name or ""):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+    return digest.hexdigest()
+
+
+def reconcile(conn: Connection, metadata: MetaData) -> List[str]:
+    """
+    Brings the database up to the declared schema without losing data:
+    creates missing tables, and adds missing columns, indexes, unique and
+    check constraints to existing ones. Nothing is dropped or altered.
+    Returns the statements issued for existing tables.
+    """
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    metadata.create_all(conn, checkfirst=True)
+    statements: List[str] = []
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in columns:
+                statements.append(
+                    f"ALTER TABLE {table.name} ADD COLUMN "
+                    f"{CreateColumn(column).compile(dialect=conn.dialect)}"
+                )
+        # MySQL reflects unique constraints as unique indexes as well
+        keys = {index["name"] for index in inspector.get_indexes(table.name)} | {
+            constraint["name"]
+            for constraint in inspector.get_unique_constraints(table.name)
+        }
+        for index in table.indexes:
+            if index.name not in keys:
+                statements.append(str(CreateIndex(index).compile(dialect=conn.dialect)))
+        checks = {
+            constraint["name"]
+            for constraint in inspector.get_check_constraints(table.name)
+        }
+        for constraint in table.constraints:
+            if constraint.name is None:
+                continue
+            if (
+                isinstance(constraint, UniqueConstraint) and constraint.name not in keys
+            ) or (
+                isinstance(constraint, CheckConstraint)
+                and constraint.name not in checks
+            ):
+                statements.append(
+                    str(AddConstraint(constraint).compile(dialect=conn.dialect))
+                )
+    for statement in statements:
+        conn.execute(text(statement))
+    return statements
+
+
+def is_synced(conn: Connection, metadata: MetaData, name: str = "base") -> bool:
+    # Whether the stored fingerprint matches the declared schema
+    if not inspect(conn).has_table(schema_fingerprints.name):
+        return False
+    return conn.scalar(
+        select(schema_fingerprints.c.fingerprint).where(
+            schema_fingerprints.c.name == name
+        )
+    ) == fingerprint(metadata, conn.dialect)
+
+
+def sync_schema(
+    conn: Connection, metadata: MetaData, name: str = "base", reset: bool = False
+) -> Optional[List[str]]:
+    """
+    Skips all DDL when the fingerprint stored in the database matches the declared
+    schema, otherwise reconciles and stores the new fingerprint.
+    With `reset`, drops and recreates every table regardless.
+    Returns None when skipped, or the statements issued for existing tables.
+    """
+    schema_fingerprints.create(conn, checkfirst=True)
+    declared: str = fingerprint(metadata, conn.dialect)
+    stored: Optional[str] = conn.scalar(
+        select(schema_fingerprints.c.fingerprint).where(
+            schema_fingerprints.c.name == name
+        )
+    )
+    if stored == declared and not reset:
+        return None
+    if reset:
+        metadata.drop_all(conn)
+        metadata.create_all(conn)
+        statements: List[str] = []
+    else:
+        statements = reconcile(conn, metadata)
+    if stored is None:
+        conn.execute(
+            schema_fingerprints.insert().values(name=name, fingerprint=declared)
+        )
+    else:
+        conn.execute(
+            update(schema_fingerprints)
+            .where(schema_fingerprints.c.name == name)
+            .values(fingerprint=declared)
+        )
+    conn.commit()
+    return statements
@@ -0,0 +1,56 @@
+from asyncio import Task, create_task, shield
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+from app.database.connection import current_request_scope
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical lookups. While a call for a key is in flight,
+    later callers of the same key await it instead of querying DB again,
+    and share its result or exception.
+    The call runs in its own task with its own session, not the request session
+    of whichever caller started it, so a cancelled caller does not cancel the
+    query for the others.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, Task] = {}
+        self.executed: int = 0
+        self.coalesced: int = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        task: Task = self._calls.get(key)
+        if task is None:
+            task = create_task(self._run(func))
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.executed += 1
+        else:
+            self.coalesced += 1
+        return await shield(task)
+
+    @staticmethod
+    async def _run(func: Callable[[], Awaitable[T]]) -> T:
+        current_request_scope.set(None)  # In the task's copy of the caller's context
+        return await func()
+
+    def _forget(self, key: Hashable, done: Task) -> None:
+        if self._calls.get(key) is done:
+            del self._calls[key]
+        if not done.cancelled():
+            done.exception()  # Retrieved, even if every caller was cancelled
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        calls = self.executed + self.coalesced
+        return {
+            "in_flight": len(self._calls),
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": round(self.coalesced / calls, 5) if calls else 0.0,
+        }
+
+
+single_flight = SingleFlight()
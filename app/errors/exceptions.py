@@ -1,3 +1,4 @@
+from math import ceil
 from app.common.config import MAX_API_KEY, MAX_API_WHITELIST
 
 
@@ -8,6 +9,7 @@ class StatusCode:
     HTTP_403 = 403
     HTTP_404 = 404
     HTTP_405 = 405
+    HTTP_429 = 429
 
 
 class APIException(Exception):
@@ -186,3 +188,26 @@ class KakaoSendFailureEx(APIException):
             code=f"{StatusCode.HTTP_400}{'11'.zfill(4)}",
             ex=ex,
         )
+
+
+class NotWhitelistedIpEx(APIException):
+    def __init__(self, ip: str, ex: Exception = None):
+        super().__init__(
+            status_code=StatusCode.HTTP_403,
+            msg=f"{ip}는 해당 API 키의 화이트리스트에 등록되지 않은 IP 입니다.",
+            detail=f"IP not in API key whitelist : {ip}",
+            code=f"{StatusCode.HTTP_403}{'12'.zfill(4)}",
+            ex=ex,
+        )
+
+
+class TooManyRequestsEx(APIException):
+    def __init__(self, retry_after: float, ex: Exception = None):
+        self.retry_after = retry_after
+        super().__init__(
+            status_code=StatusCode.HTTP_429,
+            msg=f"요청이 너무 많습니다. {ceil(retry_after)}초 후에 다시 시도해주세요.",
+            detail=f"Too many requests. Retry after {ceil(retry_after)} seconds.",
+            code=f"{StatusCode.HTTP_429}{'13'.zfill(4)}",
+            ex=ex,
+        )
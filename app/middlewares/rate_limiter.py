@@ -0,0 +1,150 @@
+import fcntl
+import mmap
+import os
+from hashlib import blake2b
+from struct import Struct
+from time import time
+from typing import Optional
+from app.common.config import Config
+from app.errors import exceptions as ex
+
+BLOCKED_RETRY_AFTER: float = 60.0  # Of a bucket that never refills (rate 0)
+
+
+class SharedTokenBucketTable:
+    """
+    Token buckets in a memory-mapped file, shared by every worker process on the node.
+    Open addressing table of fixed-size slots: (key hash, tokens, updated_at).
+    A key probes a window of `max_probes` slots, which is locked with one
+    fcntl byte-range lock while the bucket is updated.
+    """
+
+    slot = Struct("<Qdd")
+
+    def __init__(self, path: str, slots: int, max_probes: int = 8) -> None:
+        self.path = path
+        self.slots = max(slots, max_probes)
+        self.max_probes = max_probes
+        self.full_table_hits: int = 0
+        self._fd: Optional[int] = None
+        self._mm: Optional[mmap.mmap] = None
+
+    def open(self) -> None:
+        if self._mm is not None:
+            return
+        size = self.slots * self.slot.size
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)  # Zero-filled, which means empty slots
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN)
+        self._fd, self._mm = fd, mmap.mmap(fd, size)
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            os.close(self._fd)
+            self._fd = self._mm = None
+
+    def consume(self, key: str, rate: float, burst: float) -> float:
+        """
+        Takes a token from the bucket of `key`. Returns 0 if allowed, else seconds to wait.
+        A bucket without refill (rate <= 0) or capacity (burst < 1) blocks every request.
+        """
+        if rate <= 0 or burst < 1:
+            return BLOCKED_RETRY_AFTER
+        self.open()
+        key_hash = (
+            int.from_bytes(
+                blake2b(key.encode("utf-8"), digest_size=8).digest(), "little"
+            )
+            | 1
+        )
+        first_slot = key_hash % (self.slots - self.max_probes + 1)  # Window never wraps
+        window_start, window_length = (
+            first_slot * self.slot.size,
+            self.max_probes * self.slot.size,
+        )
+        now = time()
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, window_length, window_start)
+        try:
+            vacant_offset: Optional[int] = None
+            for offset in range(
+                window_start, window_start + window_length, self.slot.size
+            ):
+                slot_key_hash, tokens, updated_at = self.slot.unpack_from(
+                    self._mm, offset
+                )
+                if slot_key_hash == key_hash:
+                    tokens = min(burst, tokens + (now - updated_at) * rate)
+                    break
+                if vacant_offset is None and (
+                    slot_key_hash == 0
+                    or now - updated_at > 3600  # Idle buckets are full anyway
+                ):
+                    vacant_offset = offset
+            else:
+                if vacant_offset is None:
+                    self.full_table_hits += 1
+                    return 0.0  # Fail open rather than limiting unrelated keys
+                offset, tokens = vacant_offset, float(burst)
+            if tokens >= 1:
+                self.slot.pack_into(self._mm, offset, key_hash, tokens - 1, now)
+                return 0.0
+            self.slot.pack_into(self._mm, offset, key_hash, tokens, now)
+            return (1 - tokens) / rate
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, window_length, window_start)
+
+
+class RateLimiter:
+    """Per-IP and per-API-key token bucket limits, enforced across worker processes"""
+
+    def __init__(self, config: Config) -> None:
+        self.enabled: bool = config.rate_limit_enabled
+        self.ip_rate: float = config.ip_rate_limit
+        self.ip_burst: int = config.ip_rate_burst
+        self.api_key_rate: float = config.api_key_rate_limit
+        self.api_key_burst: int = config.api_key_rate_burst
+        self.table = SharedTokenBucketTable(
+            path=config.rate_limit_table_path, slots=config.rate_limit_table_slots
+        )
+        self.allowed: int = 0
+        self.limited: int = 0
+
+    def _consume(self, key: str, rate: float, burst: float) -> None:
+        retry_after: float = self.table.consume(key, rate=rate, burst=burst)
+        if retry_after > 0:
+            self.limited += 1
+            raise ex.TooManyRequestsEx(retry_after=retry_after)
+        self.allowed += 1
+
+    def check_ip(self, ip: str) -> None:
+        if self.enabled:
+            self._consume(f"ip:{ip}", rate=self.ip_rate, burst=self.ip_burst)
+
+    def check_api_key(
+        self,
+        access_key: str,
+        rate: Optional[float] = None,
+        burst: Optional[int] = None,
+    ) -> None:
+        if self.enabled:
+            self._consume(
+                f"key:{access_key}",
+                rate=rate if rate is not None else self.api_key_rate,
+                burst=burst if burst is not None else self.api_key_burst,
+            )
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "full_table_hits": self.table.full_table_hits,
+        }
+
+
+rate_limiter = RateLimiter(Config.get())
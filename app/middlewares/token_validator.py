@@ -1,108 +1,204 @@
+from functools import partial
+from math import ceil
+from hmac import compare_digest
 from time import time
 from re import match
-from typing import Union, Tuple, Optional
+from typing import Dict, List, Union, Tuple, Optional, Sequence
 from sqlalchemy.exc import OperationalError
-from starlette.middleware.base import RequestResponseEndpoint
+from starlette.datastructures import Headers
+from starlette.middleware.cors import CORSMiddleware
 from starlette.requests import Request
 from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from app.common.config import (
     Config,
     EXCEPT_PATH_LIST,
     EXCEPT_PATH_REGEX,
     SAMPLE_JWT_TOKEN,
 )
-from app.database.crud import get_api_key_and_owner
+from app.database.crud import ResolvedApiKey, resolve_api_key
+from app.database.query_stats import query_stats, track_queries
+from app.database.schema import db
 from app.errors import exceptions as ex
 from app.errors.exceptions import APIException, SqlFailureEx
+from app.middlewares.rate_limiter import rate_limiter
+from app.middlewares.trusted_hosts import TrustedHostMiddleware
 from app.models import UserToken
 from app.utils.date_utils import UTC
 from app.utils.logger import api_logger
-from app.utils.query_utils import row_to_dict
-from app.utils.encoding_and_hashing import hash_params, token_decode
+from app.utils.encoding_and_hashing import hash_params, hash_params_v2, token_decode
 
 config = Config.get()
 
 
-async def access_control(request: Request, call_next: RequestResponseEndpoint):
-    headers, cookies = request.headers, request.cookies
-    url = request.url.path
-    query_params = str(request.query_params)
-    ip = request.client.host
+class AccessControlMiddleware:
+    """
+    Pure ASGI security pipeline, equivalent to the former middleware stack of
+    TrustedHostMiddleware -> CORSMiddleware -> access_control(BaseHTTPMiddleware).
+    Request headers are parsed once and shared by all three stages.
+    """
 
-    response: Optional[Response] = None
-    error: Optional[Union[SqlFailureEx, APIException]] = None
-    request.state.req_time = UTC.now()
-    request.state.start = time()
-    request.state.inspect = None
-    request.state.user = None
-    request.state.service = None
-    request.state.ip = ip.split(",")[0] if "," in ip else ip
+    def __init__(
+        self,
+        app: ASGIApp,
+        trusted_hosts: Sequence[str] = None,
+        allowed_sites: Sequence[str] = None,
+        except_path: Sequence[str] = None,
+    ):
+        self.app: ASGIApp = app
+        self.trusted_host = TrustedHostMiddleware(
+            app, allowed_hosts=trusted_hosts, except_path=except_path
+        )
+        self.cors = CORSMiddleware(
+            app,
+            allow_origins=allowed_sites if allowed_sites is not None else (),
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+        )
 
-    if await url_pattern_check(url, EXCEPT_PATH_REGEX) or url in EXCEPT_PATH_LIST:
-        response = await call_next(request)
-        if url != "/":
-            await api_logger(request=request, response=response)
-        return response
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
 
-    try:
-        if url.startswith("/api/services"):  # Api-services must use session
-            # [LOCAL] Validate token by headers(secret) and queries(key, timestamp) with session
-            access_key, timestamp = await queries_params_to_key_and_timestamp(
-                query_params
-            )
-            if "secret" not in headers.keys():
-                raise ex.APIHeaderInvalidEx()
-            request.state.user: UserToken = await validate_access_key(
-                access_key,
-                query_from_session=True,
-                query_check=True,
+        headers = Headers(scope=scope)
+        invalid_host_response: Optional[
+            Response
+        ] = self.trusted_host.get_invalid_host_response(scope, headers)
+        if invalid_host_response is not None:
+            await invalid_host_response(scope, receive, send)
+            return
+        if scope["type"] == "websocket":
+            await self.app(scope, receive, send)
+            return
+
+        if "origin" in headers:
+            if (
+                scope["method"] == "OPTIONS"
+                and "access-control-request-method" in headers
+            ):
+                await self.cors.preflight_response(request_headers=headers)(
+                    scope, receive, send
+                )
+                return
+            send = partial(self.cors.send, send=send, request_headers=headers)
+        with track_queries(config.n_plus_one_threshold):
+            async with db.request_scope():
+                await self.access_control(scope, receive, send, headers)
+
+    async def access_control(
+        self, scope: Scope, receive: Receive, send: Send, headers: Headers
+    ) -> None:
+        request = Request(scope)
+        cookies = request.cookies
+        url = scope.get("root_path", "") + scope["path"]
+        query_params = str(request.query_params)
+        ip = request.client.host
+
+        error: Optional[Union[SqlFailureEx, APIException]] = None
+        response_status: List[int] = []
+        request.state.req_time = UTC.now()
+        request.state.start = time()
+        request.state.inspect = None
+        request.state.user = None
+        request.state.service = None
+        request.state.ip = ip.split(",")[0] if "," in ip else ip
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response_status.append(message["status"])
+            await send(message)
+
+        if await url_pattern_check(url, EXCEPT_PATH_REGEX) or url in EXCEPT_PATH_LIST:
+            await self.app(scope, receive, send_wrapper)
+            if url != "/":
+                api_logger(
+                    request=request,
+                    status_code=response_status[0],
+                    sql=query_stats.get().stats,
+                )
+            return
+
+        try:
+            if url.startswith("/api/services"):  # Api-services must use session
+                # [LOCAL] Validate token by headers(secret) and queries(key, timestamp) with session
+                rate_limiter.check_ip(request.state.ip)
+                if headers.get("signature-version") == "2":
+                    signature_version = 2
+                    (
+                        access_key,
+                        timestamp,
+                        signed_query_params,
+                    ) = await queries_params_to_key_timestamp_and_canonical_qs(
+                        scope["query_string"].decode("latin-1")
+                    )
+                else:
+                    signature_version = 1
+                    access_key, timestamp = await queries_params_to_key_and_timestamp(
+                        query_params
+                    )
+                    signed_query_params = query_params
+                if "secret" not in headers:
+                    raise ex.APIHeaderInvalidEx()
+                request.state.user: UserToken = await validate_access_key(
+                    access_key,
+                    query_from_session=True,
+                    query_check=True,
+                    query_params=signed_query_params,
+                    secret=headers["secret"],
+                    timestamp=timestamp,
+                    ip=request.state.ip,
+                    signature_version=signature_version,
+                )
+
+            elif url.startswith("/api"):  # Api-non-services don't use session
+                # Validate token by headers(Authorization)
+                if "authorization" not in headers:
+                    raise ex.NotAuthorized()
+                request.state.user: UserToken = await validate_access_key(
+                    headers.get("authorization")
+                )
+
+            else:  # Non-api pages with template rendering don't use session
+                # Validate token by cookies(Authorization)
+                if url.startswith("/test"):
+                    cookies["Authorization"] = SAMPLE_JWT_TOKEN
+                if "Authorization" not in cookies.keys():
+                    raise ex.NotAuthorized()
+                request.state.user: UserToken = await validate_access_key(
+                    cookies.get("Authorization")
+                )
+            await self.app(scope, receive, send_wrapper)
+
+        except Exception as exception:  # If any error occurs...
+            if response_status:  # Too late to replace a response already sent
+                raise
+            error: Union[
+                Exception, SqlFailureEx, APIException
+            ] = await exception_handler(exception)
+            await JSONResponse(
+                status_code=error.status_code,
+                content={
+                    "status": error.status_code,
+                    "msg": error.msg,
+                    "detail": error.detail,
+                    "code": error.code,
+                },
+                headers={"Retry-After": str(ceil(error.retry_after))}
+                if isinstance(error, ex.TooManyRequestsEx)
+                else None,
+            )(scope, receive, send)
+        finally:
+            api_logger(
+                request=request,
+                status_code=response_status[0] if response_status else None,
+                error=error,
+                cookies=cookies,
+                headers=headers,
                 query_params=query_params,
-                secret=headers["secret"],
-                timestamp=timestamp,
-            )
-
-        elif url.startswith("/api"):  # Api-non-services don't use session
-            # Validate token by headers(Authorization)
-            if "authorization" not in headers.keys():
-                raise ex.NotAuthorized()
-            request.state.user: UserToken = await validate_access_key(
-                headers.get("authorization")
-            )
-
-        else:  # Non-api pages with template rendering don't use session
-            # Validate token by cookies(Authorization)
-            if url.startswith("/test"):
-                cookies["Authorization"] = SAMPLE_JWT_TOKEN
-            if "Authorization" not in cookies.keys():
-                raise ex.NotAuthorized()
-            request.state.user: UserToken = await validate_access_key(
-                cookies.get("Authorization")
-            )
-        response = await call_next(request)
-
-    except Exception as exception:  # If any error occurs...
-        error: Union[Exception, SqlFailureEx, APIException] = await exception_handler(
-            exception
-        )
-        response = JSONResponse(
-            status_code=error.status_code,
-            content={
-                "status": error.status_code,
-                "msg": error.msg,
-                "detail": error.detail,
-                "code": error.code,
-            },
-        )
-    finally:
-        await api_logger(
-            request=request,
-            response=response,
-            error=error,
-            cookies=cookies,
-            headers=dict(headers),
-            query_params=query_params,
-        ) if url.startswith("/api/services") or error is not None else ...
-        return response
+                sql=query_stats.get().stats,
+            ) if url.startswith("/api/services") or error is not None else ...
 
 
 async def validate_access_key(
@@ -112,12 +208,33 @@ async def validate_access_key(
     secret: Optional[str] = None,
     query_params: Optional[str] = None,
     timestamp: Optional[str] = None,
+    ip: Optional[str] = None,
+    signature_version: int = 1,
 ) -> UserToken:
-    if query_from_session:  # Find API key from session
-        matched_api_key, matched_user = await get_api_key_and_owner(
-            access_key=access_key
-        )
-        if query_check:  # Validate queries with timestamp and secret
+    if query_from_session:  # Find API key, owner and whitelist from session at once
+        resolved: ResolvedApiKey = await resolve_api_key(access_key=access_key)
+        matched_api_key, matched_user = resolved.api_key, resolved.owner
+        if query_check and signature_version == 2:
+            # Validate canonical queries with epoch timestamp and secret
+            if (
+                secret is None
+                or not secret.isascii()  # compare_digest takes ASCII strings only
+                or not compare_digest(
+                    secret,
+                    hash_params_v2(
+                        qs=query_params, secret_key=matched_api_key.secret_key
+                    ),
+                )
+            ):
+                raise ex.APIHeaderInvalidEx()
+            try:
+                request_timestamp = int(timestamp)
+            except ValueError:
+                raise ex.APITimestampEx()
+            now_timestamp: int = int(time())
+            if not (now_timestamp - 10 < request_timestamp < now_timestamp + 10):
+                raise ex.APITimestampEx()
+        elif query_check:  # Validate queries with timestamp and secret
             if not secret == hash_params(
                 qs=query_params, secret_key=matched_api_key.secret_key
             ):
@@ -125,9 +242,22 @@ async def validate_access_key(
             now_timestamp: int = UTC.timestamp(hour_diff=9)
             if not (now_timestamp - 10 < int(timestamp) < now_timestamp + 10):
                 raise ex.APITimestampEx()
-        return UserToken(**row_to_dict(matched_user))
+        # After the signature, so that unsigned requests can't probe the whitelist
+        if (
+            ip is not None
+            and matched_api_key.is_whitelisted
+            and ip not in resolved.whitelist_ips
+        ):
+            raise ex.NotWhitelistedIpEx(ip=ip)
+        # Counted only for signed requests, so a leaked access key alone can't drain it
+        rate_limiter.check_api_key(
+            matched_api_key.access_key,
+            rate=matched_api_key.rate_limit,
+            burst=matched_api_key.rate_burst,
+        )
+        return matched_user
 
-    else:  # Decoding token access key without session
+    else:  # Decoding token access key without session, verified tokens are cached
         token_info: dict = await token_decode(access_key=access_key)
         return UserToken(**token_info)
 
@@ -145,6 +275,22 @@ async def queries_params_to_key_and_timestamp(query_params: str) -> Tuple[str, s
     return qs_dict["key"], qs_dict["timestamp"]
 
 
+async def queries_params_to_key_timestamp_and_canonical_qs(
+    query_params: str,
+) -> Tuple[str, str, str]:
+    # [v2] Parses in a single pass. Canonical query string is the pairs sorted by key.
+    qs_dict: Dict[str, str] = {}
+    for qs_split in query_params.split("&"):
+        key, separator, value = qs_split.partition("=")
+        if not separator:
+            raise ex.APIQueryStringEx()
+        qs_dict[key] = value
+    if "key" not in qs_dict or "timestamp" not in qs_dict:
+        raise ex.APIQueryStringEx()
+    canonical_qs = "&".join(f"{key}={qs_dict[key]}" for key in sorted(qs_dict))
+    return qs_dict["key"], qs_dict["timestamp"], canonical_qs
+
+
 async def url_pattern_check(path: str, pattern: str) -> bool:
     return True if match(pattern, path) else False
 
@@ -1,6 +1,6 @@
-from typing import Sequence
+from typing import Optional, Sequence
 from starlette.datastructures import URL, Headers
-from starlette.responses import PlainTextResponse, RedirectResponse
+from starlette.responses import PlainTextResponse, RedirectResponse, Response
 from starlette.types import ASGIApp, Receive, Scope, Send
 from app.errors.error_responses import ErrorResponses
 
@@ -17,10 +17,10 @@ class TrustedHostMiddleware:
         self.allowed_hosts: list = (
             ["*"] if allowed_hosts is None else list(allowed_hosts)
         )
-        self.allow_any: bool = "*" in allowed_hosts
+        self.allow_any: bool = "*" in self.allowed_hosts
         self.www_redirect: bool = www_redirect
         self.except_path: list = [] if except_path is None else list(except_path)
-        for allowed_host in allowed_hosts:
+        for allowed_host in self.allowed_hosts:
             if "*" in allowed_host[1:]:
                 raise ErrorResponses.enforce_domain_wildcard
             if (
@@ -36,8 +36,19 @@ class TrustedHostMiddleware:
             await self.app(scope, receive, send)
             return
 
-        headers = Headers(scope=scope)
+        response = self.get_invalid_host_response(scope, Headers(scope=scope))
+        if response is None:
+            await self.app(scope, receive, send)
+        else:
+            await response(scope, receive, send)
+
+    def get_invalid_host_response(
+        self, scope: Scope, headers: Headers
+    ) -> Optional[Response]:
+        if self.allow_any:
+            return None
         host = headers.get("host", "").split(":")[0]
+        path = scope.get("root_path", "") + scope["path"]
         is_valid_host = False
         found_www_redirect = False
         for pattern in self.allowed_hosts:
@@ -45,7 +56,7 @@ class TrustedHostMiddleware:
                 host == pattern
                 or pattern.startswith("*")
                 and host.endswith(pattern[1:])
-                or URL(scope=scope).path in self.except_path
+                or path in self.except_path
             ):
                 is_valid_host = True
                 break
@@ -53,12 +64,9 @@ class TrustedHostMiddleware:
                 found_www_redirect = True
 
         if is_valid_host:
-            await self.app(scope, receive, send)
-        else:
-            if found_www_redirect and self.www_redirect:
-                url = URL(scope=scope)
-                redirect_url = url.replace(netloc="www." + url.netloc)
-                response = RedirectResponse(url=str(redirect_url))
-            else:
-                response = PlainTextResponse("Invalid host header", status_code=400)
-            await response(scope, receive, send)
+            return None
+        if found_www_redirect and self.www_redirect:
+            url = URL(scope=scope)
+            redirect_url = url.replace(netloc="www." + url.netloc)
+            return RedirectResponse(url=str(redirect_url))
+        return PlainTextResponse("Invalid host header", status_code=400)
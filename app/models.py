@@ -1,6 +1,6 @@
 from datetime import datetime
 from enum import Enum
-from typing import List
+from typing import List, Optional
 
 from pydantic import Field
 from pydantic.main import BaseModel
@@ -33,6 +33,12 @@ class SendEmail(BaseModel):
     email_to: List[EmailRecipients] = None
 
 
+class EmailSendResult(BaseModel):
+    email: str
+    sent: bool
+    error: Optional[str] = None
+
+
 class KakaoMsgBody(BaseModel):
     msg: str = None
 
@@ -1,12 +1,12 @@
-import bcrypt
 from fastapi import APIRouter, Response
 from fastapi.requests import Request
+from sqlalchemy.exc import IntegrityError
 from app.common.config import TOKEN_EXPIRE_HOURS
 from app.errors.error_responses import ErrorResponses
 from app.database.crud import is_email_exist, register_new_user
 from app.database.schema import Users
 from app.models import SnsType, Token, UserRegister, UserToken
-from app.utils.encoding_and_hashing import create_access_token
+from app.utils.encoding_and_hashing import create_access_token, password_hasher
 
 router = APIRouter(prefix="/auth")
 
@@ -38,15 +38,15 @@ async def register(
             raise ErrorResponses.no_email_or_password
         if await is_email_exist(reg_info.email):
             raise ErrorResponses.email_already_taken
-        hashed_password: bytes = bcrypt.hashpw(
-            password=reg_info.password.encode("utf-8"),
-            salt=bcrypt.gensalt(),
-        )
-        new_user: Users = await register_new_user(
-            email=reg_info.email,
-            hashed_password=hashed_password,
-            ip_address=request.client.host,
-        )
+        hashed_password: bytes = await password_hasher.hash(reg_info.password)
+        try:
+            new_user: Users = await register_new_user(
+                email=reg_info.email,
+                hashed_password=hashed_password,
+                ip_address=request.client.host,
+            )
+        except IntegrityError:  # Registered meanwhile, as email is unique
+            raise ErrorResponses.email_already_taken
         data_to_be_tokenized: dict = UserToken.from_orm(new_user).dict(
             exclude={"password", "marketing_agree"}
         )
@@ -76,10 +76,7 @@ async def login(
         matched_user: Users = await Users.first_filtered_by(email=user_info.email)
         if matched_user is None:
             raise ErrorResponses.no_matched_user
-        if not bcrypt.checkpw(
-            password=user_info.password.encode("utf-8"),
-            hashed_password=matched_user.password.encode("utf-8"),
-        ):
+        if not await password_hasher.check(user_info.password, matched_user.password):
             raise ErrorResponses.no_matched_user
         data_to_be_tokenized: dict = UserToken.from_orm(matched_user).dict(
             exclude={"password", "marketing_agree"}
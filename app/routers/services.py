@@ -1,14 +1,17 @@
 import json
-import os
-from time import sleep
-import yagmail
-import requests
+from typing import List, Optional
 from fastapi import APIRouter
 from fastapi.logger import logger
 from starlette.background import BackgroundTasks
 from starlette.requests import Request
 from app.errors import exceptions as ex
-from app.models import MessageOk, KakaoMsgBody, SendEmail
+from app.models import (
+    MessageOk,
+    KakaoMsgBody,
+    SendEmail,
+    EmailRecipients,
+    EmailSendResult,
+)
 from app.common.config import (
     KAKAO_RESTAPI_TOKEN,
     KAKAO_IMAGE_URL,
@@ -17,6 +20,8 @@ from app.common.config import (
     AWS_AUTHORIZED_EMAIL,
 )
 from app.utils.encoding_and_hashing import encode_from_utf8
+from app.utils.http_client import kakao_client
+from app.utils.mailer import MailResult, mailer
 import boto3
 from botocore.exceptions import ClientError
 
@@ -66,13 +71,10 @@ async def send_kakao(request: Request, body: KakaoMsgBody):
         ensure_ascii=False,
     )
     data = {"template_object": template_object}
-    print(data)
-    res = requests.post(
-        "https://kapi.kakao.com/v2/api/talk/memo/default/send",
-        headers=headers,
-        data=data,
-    )
     try:
+        res = await kakao_client.post(
+            "/v2/api/talk/memo/default/send", headers=headers, data=data
+        )
         res.raise_for_status()
         if res.json()["result_code"] != 0:
             raise Exception("KAKAO SEND FAILED")
@@ -103,40 +105,30 @@ email_content = """
 """
 
 
-@router.post("/email/send_by_gmail")
+@router.post("/email/send_by_gmail", response_model=List[EmailSendResult])
 async def email_by_gmail(request: Request, mailing_list: SendEmail):
-    # t = time()
-    send_email(mailing_list=mailing_list.email_to)
-    return MessageOk()
+    return [result._asdict() for result in await send_email(mailing_list.email_to)]
 
 
 @router.post("/email/send_by_gmail2")
 async def email_by_gmail2(
     request: Request, mailing_list: SendEmail, background_tasks: BackgroundTasks
 ):
-    # t = time()
     background_tasks.add_task(send_email, mailing_list=mailing_list.email_to)
     return MessageOk()
 
 
-def send_email(**kwargs):
-    mailing_list = kwargs.get("mailing_list", None)
-    email_password = os.environ.get("EMAIL_PW", None)
-    email_addr = os.environ.get("EMAIL_ADDR", None)
-    last_email = ""
-    if mailing_list:
-        try:
-            yag = yagmail.SMTP({email_addr: "라이언X코알라"}, email_password)
-            # https://myaccount.google.com/u/1/lesssecureapps
-            for m_l in mailing_list:
-                contents = [email_content.format(m_l.name)]
-                sleep(1)
-                yag.send(m_l.email, "이렇게 한번 보내봅시다.", contents)
-                last_email = m_l.email
-            return True
-        except Exception as e:
-            print(e)
-            print(last_email)
+async def send_email(mailing_list: Optional[List[EmailRecipients]]) -> List[MailResult]:
+    if not mailing_list:
+        return []
+    results: List[MailResult] = await mailer.send_bulk(
+        (m_l.email, "이렇게 한번 보내봅시다.", email_content.format(m_l.name))
+        for m_l in mailing_list
+    )
+    for result in results:
+        if not result.sent:
+            logger.warning(f"Email to {result.email} failed: {result.error}")
+    return results
 
 
 @router.post("/email/send_by_ses")
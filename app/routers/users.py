@@ -1,6 +1,8 @@
-from typing import List
-from fastapi import APIRouter
+from typing import Any, AsyncIterator, List, Optional, Type
+from fastapi import APIRouter, Query
+from pydantic import BaseModel
 from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
 from app.database import crud
 from app.models import (
     GetApiKeyList,
@@ -16,6 +18,36 @@ from app.models import MessageOk, UserMe
 router = APIRouter(prefix="/user")
 
 
+async def json_array_stream(
+    first_instance: Any, instances: AsyncIterator, model: Type[BaseModel]
+) -> AsyncIterator[str]:
+    # Emits a JSON array item by item, not to hold the whole list in memory
+    yield "[" + model.from_orm(first_instance).json()
+    async for instance in instances:
+        yield "," + model.from_orm(instance).json()
+    yield "]"
+
+
+async def json_array_response(
+    instances: AsyncIterator, model: Type[BaseModel]
+) -> Response:
+    """
+    Streams `instances` as a JSON array of `model`.
+    The first batch is fetched before the response starts, so that a failing query
+    is answered with the status code of its error. Once streaming, an error can
+    only abort the response, which leaves the client with an incomplete body.
+    The route's `response_model` is then only for docs, so pass the same `model`.
+    """
+    try:
+        first_instance = await instances.__anext__()
+    except StopAsyncIteration:
+        return Response(content="[]", media_type="application/json")
+    return StreamingResponse(
+        json_array_stream(first_instance, instances, model=model),
+        media_type="application/json",
+    )
+
+
 @router.get("/me", response_model=UserMe)
 async def get_me(request: Request):
     return await crud.get_me(user_id=request.state.user.id)
@@ -32,8 +64,18 @@ async def delete_me(request: Request):
 
 
 @router.get("/apikeys", response_model=List[GetApiKeyList])
-async def get_api_keys(request: Request):
-    return await crud.get_api_keys(user_id=request.state.user.id)
+async def get_api_keys(
+    request: Request,
+    limit: Optional[int] = Query(default=None, ge=1),
+    cursor: Optional[int] = Query(default=None, ge=0),
+):
+    """
+    Ordered by id. For the next page, pass the id of the last item as `cursor`
+    """
+    return await json_array_response(
+        crud.stream_api_keys(user_id=request.state.user.id, cursor=cursor, limit=limit),
+        model=GetApiKeyList,
+    )
 
 
 @router.post("/apikeys", response_model=GetApiKeys)
@@ -72,8 +114,20 @@ async def delete_api_key(
 
 
 @router.get("/apikeys/{key_id}/whitelists", response_model=List[GetApiWhiteLists])
-async def get_api_keys_whitelists(api_key_id: int):
-    return await crud.get_api_key_whitelist(api_key_id=api_key_id)
+async def get_api_keys_whitelists(
+    api_key_id: int,
+    limit: Optional[int] = Query(default=None, ge=1),
+    cursor: Optional[int] = Query(default=None, ge=0),
+):
+    """
+    Ordered by id. For the next page, pass the id of the last item as `cursor`
+    """
+    return await json_array_response(
+        crud.stream_api_key_whitelist(
+            api_key_id=api_key_id, cursor=cursor, limit=limit
+        ),
+        model=GetApiWhiteLists,
+    )
 
 
 @router.post("/apikeys/{key_id}/whitelists", response_model=GetApiWhiteLists)
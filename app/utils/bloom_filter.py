@@ -0,0 +1,47 @@
+from hashlib import blake2b
+from math import ceil, exp, log
+from typing import Iterator
+
+
+class BloomFilter:
+    """
+    Bit-array membership filter. `in` may give false positives at about `error_rate`
+    when holding up to `capacity` items, but never false negatives.
+    """
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.bit_count: int = ceil(-self.capacity * log(error_rate) / (log(2) ** 2))
+        self.hash_count: int = max(1, round(self.bit_count / self.capacity * log(2)))
+        self.bits = bytearray(ceil(self.bit_count / 8))
+        self.count: int = 0
+
+    def _bit_indexes(self, item: str) -> Iterator[int]:
+        # Double hashing: k indexes from two 64-bit halves of one digest
+        digest = blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(
+            digest[8:], "little"
+        )
+        return ((h1 + i * h2) % self.bit_count for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for index in self._bit_indexes(item):
+            self.bits[index >> 3] |= 1 << (index & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self.bits[index >> 3] & (1 << (index & 7))
+            for index in self._bit_indexes(item)
+        )
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self.bits)
+
+    @property
+    def estimated_false_positive_rate(self) -> float:
+        return (
+            1 - exp(-self.hash_count * self.count / self.bit_count)
+        ) ** self.hash_count
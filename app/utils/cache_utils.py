@@ -0,0 +1,66 @@
+from sys import getsizeof
+from typing import Any, Hashable, Optional
+from cachetools import TLRUCache, TTLCache
+
+_MISSING = object()
+
+
+class CacheStatsMixin:
+    """Counts hits, misses, evictions and expirations of a cachetools cache"""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        value = super().get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def popitem(self) -> tuple:
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+    def expire(self, time: Optional[float] = None) -> list:
+        expired = super().expire(time)
+        if expired:
+            self.expirations += len(expired)
+        return expired
+
+    @property
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "currsize": self.currsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 5) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class StatsTTLCache(CacheStatsMixin, TTLCache):
+    """TTL cache with hit/miss/eviction counters"""
+
+
+class StatsTLRUCache(CacheStatsMixin, TLRUCache):
+    """Per-item time-to-use cache with hit/miss/eviction counters"""
+
+
+def deep_getsizeof(obj: Any) -> int:
+    # Approximate memory footprint of flat containers of scalars (e.g. JWT payloads)
+    if isinstance(obj, dict):
+        return getsizeof(obj) + sum(
+            getsizeof(key) + getsizeof(value) for key, value in obj.items()
+        )
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return getsizeof(obj) + sum(getsizeof(item) for item in obj)
+    return getsizeof(obj)
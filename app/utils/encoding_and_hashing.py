@@ -1,7 +1,12 @@
+from asyncio import AbstractEventLoop, Semaphore, get_running_loop
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from cryptography.fernet import Fernet, InvalidToken
 from cryptography.hazmat.primitives.hashes import HashAlgorithm, SHA256
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from datetime import datetime, timedelta
+from hashlib import sha256
+from time import time
 from jwt import decode as jwt_decode
 from jwt import encode as jwt_encode
 from jwt.exceptions import ExpiredSignatureError, DecodeError
@@ -13,12 +18,23 @@ from os.path import exists
 from hmac import HMAC, new
 from re import findall
 from base64 import urlsafe_b64encode, b64encode
-from typing import Any
+from typing import Any, Callable, Optional
+from cachetools import LRUCache
+import bcrypt
 import json
 from app.errors.exceptions import TokenDecodeEx, TokenExpiredEx
 from app.database.schema import ApiKeys
 from app.models import AddApiKey
-from app.common.config import JWT_ALGORITHM, JWT_SECRET
+from app.common.config import Config, JWT_ALGORITHM, JWT_SECRET
+from app.utils.cache_utils import StatsTLRUCache, deep_getsizeof
+
+config = Config.get()
+verified_token_cache: StatsTLRUCache = StatsTLRUCache(
+    maxsize=config.token_cache_max_bytes,
+    ttu=lambda _, payload, now: payload.get("exp", now + config.token_cache_ttl),
+    timer=time,
+    getsizeof=lambda payload: deep_getsizeof(payload) + 64,  # + sha256 digest key
+)  # sha256(token) -> verified payload, kept until the token's exp
 
 
 class SecretConfigSetup:
@@ -88,6 +104,85 @@ class SecretConfigSetup:
                 return secret_config
 
 
+class PasswordHasher:
+    """
+    Runs bcrypt in a dedicated thread pool, so that hashing never blocks the event loop.
+    At most `max_concurrency` hashes run at once, the rest wait in queue.
+    """
+
+    def __init__(self, rounds: int, max_concurrency: int) -> None:
+        self.rounds = rounds
+        self.max_concurrency = max_concurrency
+        self.queue_depth: int = 0
+        self.in_flight: int = 0
+        self.completed: int = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[Semaphore] = None
+        self._loop: Optional[AbstractEventLoop] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency, thread_name_prefix="bcrypt"
+            )
+        return self._executor
+
+    @property
+    def semaphore(self) -> Semaphore:
+        loop = get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore, self._loop = Semaphore(self.max_concurrency), loop
+        return self._semaphore
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        self.queue_depth += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.queue_depth -= 1
+        self.in_flight += 1
+        try:
+            return await get_running_loop().run_in_executor(
+                self.executor, partial(func, *args)
+            )
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self.semaphore.release()
+
+    async def hash(self, password: str) -> bytes:
+        return await self.run(
+            bcrypt.hashpw, password.encode("utf-8"), bcrypt.gensalt(self.rounds)
+        )
+
+    async def check(self, password: str, hashed_password: str) -> bool:
+        return await self.run(
+            bcrypt.checkpw, password.encode("utf-8"), hashed_password.encode("utf-8")
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._semaphore = None
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "rounds": self.rounds,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+        }
+
+
+password_hasher = PasswordHasher(
+    rounds=config.bcrypt_rounds, max_concurrency=config.bcrypt_max_concurrency
+)
+
+
 def encode_from_utf8(text):
     # Check if text contains any non-ASCII characters
     matches = findall(r"[^\x00-\x7F]+", text)
@@ -111,6 +206,22 @@ def hash_params(qs: str, secret_key: str) -> str:
     return str(b64encode(mac.digest()).decode("utf-8"))
 
 
+hmac_context_cache: LRUCache = LRUCache(
+    maxsize=config.api_key_cache_maxsize
+)  # secret_key -> HMAC already keyed with it
+
+
+def hash_params_v2(qs: str, secret_key: str) -> str:
+    # Copying a pre-keyed HMAC skips re-deriving the inner/outer key pads
+    keyed_mac: Optional[HMAC] = hmac_context_cache.get(secret_key)
+    if keyed_mac is None:
+        keyed_mac = new(key=bytes(secret_key, encoding="utf-8"), digestmod="sha256")
+        hmac_context_cache[secret_key] = keyed_mac
+    mac: HMAC = keyed_mac.copy()
+    mac.update(bytes(qs, encoding="utf-8"))
+    return str(b64encode(mac.digest()).decode("utf-8"))
+
+
 async def generate_api_key(user_id: int, additional_key_info: AddApiKey) -> ApiKeys:
     alnums = ascii_letters + digits
     secret_key = "".join(choice(alnums) for _ in range(40))
@@ -132,13 +243,18 @@ def create_access_token(*, data: dict = None, expires_delta: int = None) -> str:
 
 
 async def token_decode(access_key: str) -> dict:
+    access_key = access_key.replace("Bearer ", "")
+    token_digest: bytes = sha256(access_key.encode("utf-8")).digest()
+    payload: Optional[dict] = verified_token_cache.get(token_digest)
+    if payload is not None:  # Signature already verified, and not expired yet
+        return payload
     try:
-        access_key = access_key.replace("Bearer ", "")
         payload = jwt_decode(access_key, key=JWT_SECRET, algorithms=[JWT_ALGORITHM])
     except ExpiredSignatureError:
         raise TokenExpiredEx()
     except DecodeError:
         raise TokenDecodeEx()
+    verified_token_cache[token_digest] = payload
     return payload
 
 
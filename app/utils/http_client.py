@@ -0,0 +1,132 @@
+from asyncio import AbstractEventLoop, Semaphore, get_running_loop, sleep
+from random import random
+from typing import Any, Optional
+import httpx
+from app.common.config import Config
+
+# Requests that surely did not reach the server, or that it refused to handle
+RETRY_EXCEPTIONS: tuple = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+RETRY_STATUS_CODES: frozenset = frozenset({429, 503})
+
+
+class AsyncHttpClient:
+    """
+    A shared httpx.AsyncClient, so that keep-alive connections are reused across requests.
+    At most `max_concurrency` requests are in flight, the rest wait in queue.
+    A request is retried up to `max_retries` times with jittered exponential backoff,
+    only if it was never sent (connection failed) or was refused (429, 503):
+    a read timeout is not retried, as the server may have already acted on it.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        connect_timeout: float,
+        read_timeout: float,
+        max_connections: int,
+        max_concurrency: int,
+        max_retries: int,
+        retry_backoff: float,
+    ) -> None:
+        self.base_url = base_url
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.in_flight: int = 0
+        self.sent: int = 0
+        self.retried: int = 0
+        self.failed: int = 0
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[Semaphore] = None
+        self._loop: Optional[AbstractEventLoop] = None
+
+    def start(self) -> None:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(
+                    self.read_timeout,
+                    connect=self.connect_timeout,
+                    pool=self.read_timeout,
+                ),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._semaphore = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self.start()
+        return self._client
+
+    @property
+    def semaphore(self) -> Semaphore:
+        loop = get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore, self._loop = Semaphore(self.max_concurrency), loop
+        return self._semaphore
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        async with self.semaphore:
+            self.in_flight += 1
+            try:
+                for attempt in range(self.max_retries + 1):
+                    if attempt:
+                        self.retried += 1
+                        await sleep(self.retry_backoff * 2 ** (attempt - 1) * random())
+                    try:
+                        response = await self.client.request(method, url, **kwargs)
+                    except RETRY_EXCEPTIONS:
+                        if attempt < self.max_retries:
+                            continue
+                        self.failed += 1
+                        raise
+                    except httpx.HTTPError:
+                        self.failed += 1
+                        raise
+                    if (
+                        response.status_code in RETRY_STATUS_CODES
+                        and attempt < self.max_retries
+                    ):
+                        await response.aclose()
+                        continue
+                    self.sent += 1
+                    return response
+            finally:
+                self.in_flight -= 1
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+
+config = Config.get()
+kakao_client: AsyncHttpClient = AsyncHttpClient(
+    base_url=config.kakao_api_url,
+    connect_timeout=config.kakao_connect_timeout,
+    read_timeout=config.kakao_read_timeout,
+    max_connections=config.kakao_max_connections,
+    max_concurrency=config.kakao_max_concurrency,
+    max_retries=config.kakao_max_retries,
+    retry_backoff=config.kakao_retry_backoff,
+)
@@ -1,19 +1,37 @@
 import json
 import logging
-from typing import Union, Optional
+from asyncio import (
+    AbstractEventLoop,
+    CancelledError,
+    Queue,
+    QueueEmpty,
+    QueueFull,
+    Task,
+    get_running_loop,
+    sleep,
+)
+from collections.abc import Mapping
+from random import random
+from typing import List, Union, Optional, Tuple
 from datetime import timedelta, datetime
 from time import time
 from fastapi.logger import logger
 from starlette.requests import Request
-from starlette.responses import Response
 
+from app.common.config import Config
 from app.errors.exceptions import APIException, SqlFailureEx
 
 
 logger.setLevel(logging.INFO)
+config = Config.get()
 
+# (request, status_code, error, processed_time, logged_at, kwargs)
+LogRecord = Tuple[
+    Request, int, Optional[Union[SqlFailureEx, APIException]], float, float, dict
+]
 
-async def hide_email(email: str) -> str:
+
+def hide_email(email: str) -> str:
     separated_email = email.split("@")
     if len(separated_email) == 2:
         local_parts, domain = separated_email
@@ -22,9 +40,7 @@ async def hide_email(email: str) -> str:
         return "".join(separated_email)
 
 
-async def error_log_generator(
-    error: Union[SqlFailureEx, APIException], request: Request
-):
+def error_log_generator(error: Union[SqlFailureEx, APIException], request: Request):
     if request.state.inspect is not None:
         frame = request.state.inspect
         error_file = frame.f_code.co_filename
@@ -41,36 +57,169 @@ async def error_log_generator(
     }
 
 
-async def api_logger(
-    request: Request,
-    response: Response = None,
-    error: Optional[Union[SqlFailureEx, APIException]] = None,
-    **kwargs,
-):
-    processed_time = time() - request.state.start
-    status_code = error.status_code if error else response.status_code
+def format_log_record(record: LogRecord) -> str:
+    request, status_code, error, processed_time, logged_at, kwargs = record
     user = request.state.user
-    utc_now = datetime.utcnow()
-
-    log = json.dumps(
+    utc_now = datetime.utcfromtimestamp(logged_at)
+    return json.dumps(
         {
             "url": request.url.hostname + request.url.path,
             "method": str(request.method),
             "statusCode": status_code,
-            "errorDetail": await error_log_generator(error=error, request=request)
+            "errorDetail": error_log_generator(error=error, request=request)
             if error is not None
             else None,
             "client": {
                 "client": request.state.ip,
                 "user": user.id if user and user.id else None,
-                "email": (await hide_email(email=user.email))
-                if user and user.email
-                else None,
+                "email": hide_email(email=user.email) if user and user.email else None,
             },
             "processedTime": str(round(processed_time * 1000, 5)) + "ms",
             "datetimeUTC": utc_now.strftime("%Y/%m/%d %H:%M:%S"),
             "datetimeKST": (utc_now + timedelta(hours=9)).strftime("%Y/%m/%d %H:%M:%S"),
         }
-        | kwargs
+        | {
+            key: dict(value) if isinstance(value, Mapping) else value
+            for key, value in kwargs.items()
+        }
+    )
+
+
+class ApiLogWriter:
+    """
+    Background writer of API logs. Requests only enqueue a tuple of references;
+    formatting and writing happen later in batches, off the request path.
+    Successful requests are sampled, and records are dropped when the queue is full.
+    """
+
+    def __init__(
+        self,
+        max_queue_size: int,
+        batch_size: int,
+        flush_interval: float,
+        success_sample_rate: float,
+    ) -> None:
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.success_sample_rate = success_sample_rate
+        self.written: int = 0
+        self.dropped: int = 0
+        self.sampled_out: int = 0
+        self._queue: Optional[Queue] = None
+        self._task: Optional[Task] = None
+        self._loop: Optional[AbstractEventLoop] = None
+
+    def start(self) -> None:
+        loop = get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        self._queue, self._loop = Queue(maxsize=self.max_queue_size), loop
+        self._task = loop.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except CancelledError:
+            pass
+        self._flush(self._drain(self._queue.qsize()))
+        self._task = None
+
+    def enqueue(
+        self,
+        request: Request,
+        status_code: int,
+        error: Optional[Union[SqlFailureEx, APIException]],
+        kwargs: dict,
+    ) -> None:
+        if (
+            error is None
+            and status_code is not None
+            and status_code < 400
+            and self.success_sample_rate < 1.0
+            and random() >= self.success_sample_rate
+        ):
+            self.sampled_out += 1
+            return
+        loop = get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self.start()  # Lazily, e.g. when lifespan events are not run or stopped
+        logged_at = time()
+        try:
+            self._queue.put_nowait(
+                (
+                    request,
+                    status_code,
+                    error,
+                    logged_at - request.state.start,
+                    logged_at,
+                    kwargs,
+                )
+            )
+        except QueueFull:
+            self.dropped += 1
+
+    async def _run(self) -> None:
+        while True:
+            batch: List[LogRecord] = [await self._queue.get()]
+            try:
+                if self._queue.qsize() < self.batch_size:
+                    await sleep(self.flush_interval)  # Let the batch fill up
+            finally:  # Also when cancelled on shutdown, not to lose the batch
+                batch.extend(self._drain(self.batch_size - 1))
+                try:
+                    self._flush(batch)
+                except Exception as exception:
+                    logger.exception(exception)
+
+    def _drain(self, max_count: int) -> List[LogRecord]:
+        records: List[LogRecord] = []
+        while len(records) < max_count:
+            try:
+                records.append(self._queue.get_nowait())
+            except QueueEmpty:
+                break
+        return records
+
+    def _flush(self, batch: List[LogRecord]) -> None:
+        for record in batch:  # One log line per record, as log shippers parse them
+            error = record[2]
+            if error and error.status_code >= 500:
+                logger.error(format_log_record(record))
+            else:
+                logger.info(format_log_record(record))
+            self.written += 1
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "queue_size": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+        }
+
+
+api_log_writer = ApiLogWriter(
+    max_queue_size=config.log_queue_size,
+    batch_size=config.log_batch_size,
+    flush_interval=config.log_flush_interval,
+    success_sample_rate=config.log_success_sample_rate,
+)
+
+
+def api_logger(
+    request: Request,
+    status_code: Optional[int] = None,
+    error: Optional[Union[SqlFailureEx, APIException]] = None,
+    **kwargs,
+) -> None:
+    api_log_writer.enqueue(
+        request=request,
+        status_code=error.status_code if error else status_code,
+        error=error,
+        kwargs=kwargs,
     )
-    logger.error(log) if error and error.status_code >= 500 else logger.info(log)
@@ -0,0 +1,177 @@
+from asyncio import AbstractEventLoop, Semaphore, gather, get_running_loop, sleep
+from email.message import EmailMessage
+from email.utils import formataddr
+from time import monotonic
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+from aiosmtplib import SMTP, SMTPException, SMTPServerDisconnected
+from app.common.config import Config, EMAIL_ADDR, EMAIL_PW
+
+
+class MailResult(NamedTuple):
+    email: str
+    sent: bool
+    error: Optional[str] = None
+
+
+class SmtpMailer:
+    """
+    Sends mails over at most `pool_size` authenticated SMTP connections, which are
+    kept open and reused across sends. Sends are spaced to at most `rate_limit`
+    mails per second (unlimited if 0), over all connections.
+    A connection that fails is closed, and a new one is opened for the next send.
+    A send on an idle connection the server dropped is retried on a new one.
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: Optional[str],
+        password: Optional[str],
+        sender: str,
+        use_tls: bool,
+        pool_size: int,
+        rate_limit: float,
+        timeout: float,
+    ) -> None:
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.sender = sender
+        self.use_tls = use_tls
+        self.pool_size = pool_size
+        self.rate_limit = rate_limit
+        self.timeout = timeout
+        self.connections_opened: int = 0
+        self.sent: int = 0
+        self.failed: int = 0
+        self._idle: List[SMTP] = []
+        self._next_send_at: float = 0.0
+        self._semaphore: Optional[Semaphore] = None
+        self._loop: Optional[AbstractEventLoop] = None
+
+    @property
+    def semaphore(self) -> Semaphore:
+        loop = get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore, self._loop = Semaphore(self.pool_size), loop
+            self._idle = []  # Bound to the previous loop
+        return self._semaphore
+
+    async def _connect(self) -> SMTP:
+        smtp = SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            use_tls=self.use_tls,
+            timeout=self.timeout,
+        )
+        await smtp.connect()  # Logs in too, if username and password are given
+        self.connections_opened += 1
+        return smtp
+
+    async def _checkout(self) -> Tuple[SMTP, bool]:
+        # An idle connection if any is left open, else a new one. Returns if reused
+        while self._idle:
+            smtp = self._idle.pop()
+            if smtp.is_connected:  # Unless closed by the server while idle
+                return smtp, True
+        return await self._connect(), False
+
+    async def _send_message(self, smtp: SMTP, message: EmailMessage) -> None:
+        try:
+            await smtp.send_message(message)
+        except (SMTPException, OSError):
+            await self._reset_or_close(smtp)
+            raise
+        except BaseException:
+            smtp.close()
+            raise
+        self._idle.append(smtp)
+
+    async def _reset_or_close(self, smtp: SMTP) -> None:
+        try:
+            await smtp.rset()  # Reusable, if only the transaction failed
+        except (SMTPException, OSError):
+            smtp.close()
+        else:
+            self._idle.append(smtp)
+
+    async def _wait_for_turn(self) -> None:
+        if self.rate_limit <= 0:
+            return
+        now = monotonic()
+        send_at = max(now, self._next_send_at)
+        self._next_send_at = send_at + 1 / self.rate_limit
+        if send_at > now:
+            await sleep(send_at - now)
+
+    def _message(self, email: str, subject: str, html: str) -> EmailMessage:
+        message = EmailMessage()
+        message["From"] = formataddr((self.sender, self.username or ""))
+        message["To"] = email
+        message["Subject"] = subject
+        message.set_content(html, subtype="html")
+        return message
+
+    async def send(self, email: str, subject: str, html: str) -> MailResult:
+        message = self._message(email, subject, html)
+        try:
+            async with self.semaphore:
+                # Turn taken once a connection is free, so that sends queued for the
+                # pool do not use up turns and then go out at once
+                await self._wait_for_turn()
+                smtp, reused = await self._checkout()
+                try:
+                    await self._send_message(smtp, message)
+                except SMTPServerDisconnected:
+                    if not reused:
+                        raise
+                    # Dropped while idle without notice: once more on a new connection
+                    await self._send_message(await self._connect(), message)
+        except (SMTPException, OSError) as e:
+            self.failed += 1
+            return MailResult(email=email, sent=False, error=str(e))
+        self.sent += 1
+        return MailResult(email=email, sent=True)
+
+    async def send_bulk(
+        self, mails: Iterable[Tuple[str, str, str]]
+    ) -> List[MailResult]:
+        # (email, subject, html) per recipient, results in the same order
+        return await gather(*(self.send(*mail) for mail in mails))
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for smtp in idle:
+            try:
+                await smtp.quit()
+            except (SMTPException, OSError):
+                smtp.close()
+        self._semaphore = None
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "pool_size": self.pool_size,
+            "idle": len(self._idle),
+            "connections_opened": self.connections_opened,
+            "sent": self.sent,
+            "failed": self.failed,
+        }
+
+
+config = Config.get()
+mailer: SmtpMailer = SmtpMailer(
+    hostname=config.smtp_host,
+    port=config.smtp_port,
+    username=EMAIL_ADDR,
+    password=EMAIL_PW,
+    sender=config.smtp_sender_name,
+    use_tls=config.smtp_use_tls,
+    pool_size=config.smtp_pool_size,
+    rate_limit=config.smtp_rate_limit,
+    timeout=config.smtp_timeout,
+)
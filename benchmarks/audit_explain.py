@@ -0,0 +1,169 @@
+"""
+Index audit: runs every crud function against a seeded dataset, EXPLAINs each
+SELECT / UPDATE / DELETE it issued, and exits with status 1 if any of them
+reads a whole table (EXPLAIN type ALL). MySQL only.
+
+Usage: API_ENV=test python -m benchmarks.audit_explain --users 5000
+Also run by tests/test_indexes.py, marked `mysql`.
+"""
+from argparse import ArgumentParser
+from asyncio import run
+from typing import Any, Awaitable, Callable, List, Tuple
+from uuid import uuid4
+from sqlalchemy import delete, event, select, text
+from app.common.config import Config
+from app.database import crud
+from app.database.schema import db, ApiKeys, ApiWhiteLists, Users
+from app.models import AddApiKey
+
+# (crud function, statement, parameters)
+captured: List[Tuple[str, str, Any]] = []
+current_label: List[str] = [""]
+
+
+def capture(conn, cursor, statement, parameters, context, executemany) -> None:
+    if not executemany and statement.lstrip().upper().startswith(
+        ("SELECT", "UPDATE", "DELETE")
+    ):
+        captured.append((current_label[0], statement, parameters))
+
+
+async def call(label: str, func: Callable[[], Awaitable[Any]]) -> Any:
+    current_label[0] = label
+    return await func()
+
+
+async def seed(users: int) -> Tuple[int, str, int]:
+    user_ids: List[int] = await Users.bulk_insert(
+        ({"email": f"{i}@audit.test", "password": "audit"} for i in range(users)),
+        return_ids=True,
+        autocommit=True,
+    )
+    api_key_ids: List[int] = await ApiKeys.bulk_insert(
+        (
+            {"user_id": user_id, "access_key": str(uuid4()), "secret_key": "audit"}
+            for user_id in user_ids
+        ),
+        return_ids=True,
+        autocommit=True,
+    )
+    await ApiWhiteLists.bulk_insert(
+        (
+            {"api_key_id": api_key_id, "ip_address": f"10.0.{api_key_id % 256}.{i}"}
+            for api_key_id in api_key_ids
+            for i in (1, 2)
+        ),
+        autocommit=True,
+    )
+    await db.execute(
+        text("ANALYZE TABLE users, api_keys, api_whitelists"), autocommit=True
+    )
+    user_id, api_key_id = user_ids[len(user_ids) // 2], api_key_ids[len(user_ids) // 2]
+    access_key: str = await db.scalar(
+        select(ApiKeys.access_key).filter_by(id=api_key_id)
+    )
+    return user_id, access_key, api_key_id
+
+
+async def exercise_crud(user_id: int, access_key: str, api_key_id: int) -> None:
+    email: str = f"{user_id}@audit.test"
+    await call("is_email_exist", lambda: crud.is_email_exist(email))
+    await call("find_matched_user", lambda: crud.find_matched_user(email))
+    await call("get_me", lambda: crud.get_me(user_id))
+    await call("resolve_api_key", lambda: crud.resolve_api_key(access_key))
+    await call(
+        "register_new_user",
+        lambda: crud.register_new_user("new@audit.test", "audit", "127.0.0.1"),
+    )
+    new_api_key: ApiKeys = await call(
+        "create_api_key",
+        lambda: crud.create_api_key(user_id, AddApiKey(user_memo="audit")),
+    )
+    await call("get_api_keys", lambda: crud.get_api_keys(user_id))
+    current_label[0] = "stream_api_keys"
+    [key async for key in crud.stream_api_keys(user_id, cursor=api_key_id, limit=10)]
+    await call(
+        "update_api_key",
+        lambda: crud.update_api_key({"user_memo": "audited"}, new_api_key.id, user_id),
+    )
+    whitelist: ApiWhiteLists = await call(
+        "create_api_key_whitelist",
+        lambda: crud.create_api_key_whitelist("10.1.1.1", new_api_key.id),
+    )
+    await call("get_api_key_whitelist", lambda: crud.get_api_key_whitelist(api_key_id))
+    current_label[0] = "stream_api_key_whitelist"
+    [item async for item in crud.stream_api_key_whitelist(api_key_id, limit=10)]
+    await call(
+        "delete_api_key_whitelist",
+        lambda: crud.delete_api_key_whitelist(user_id, new_api_key.id, whitelist.id),
+    )
+    await call(
+        "delete_api_key",
+        lambda: crud.delete_api_key(new_api_key.id, new_api_key.access_key, user_id),
+    )
+
+
+async def explain() -> int:
+    full_scans: int = 0
+    async with db.engine.connect() as conn:
+        for label, statement, parameters in captured:
+            for row in (
+                await conn.exec_driver_sql("EXPLAIN " + statement, parameters)
+            ).mappings():
+                full_scan: bool = row["type"] == "ALL"
+                full_scans += full_scan
+                print(
+                    f"{'FULL SCAN' if full_scan else 'ok':<9} {label:<26} "
+                    f"{row['table'] or '-':<16} type={row['type']} "
+                    f"key={row['key']} rows={row['rows']}"
+                )
+    return full_scans
+
+
+async def clean_up() -> None:
+    seeded_users = select(Users.id).where(Users.email.like("%@audit.test"))
+    seeded_keys = select(ApiKeys.id).where(ApiKeys.user_id.in_(seeded_users))
+    await db.execute(
+        delete(ApiWhiteLists).where(ApiWhiteLists.api_key_id.in_(seeded_keys)),
+        autocommit=True,
+    )
+    await db.execute(
+        delete(ApiKeys).where(ApiKeys.user_id.in_(seeded_users)), autocommit=True
+    )
+    await db.execute(
+        delete(Users).where(Users.email.like("%@audit.test")), autocommit=True
+    )
+
+
+async def audit(users: int) -> Tuple[int, int]:
+    # Returns numbers of statements and full table scans, with DB initiated
+    captured.clear()
+    try:
+        user_id, access_key, api_key_id = await seed(users)
+        event.listen(db.engine.sync_engine, "before_cursor_execute", capture)
+        try:
+            with db.use_primary():  # Reads too, as the listener is on primary
+                await exercise_crud(user_id, access_key, api_key_id)
+        finally:
+            event.remove(db.engine.sync_engine, "before_cursor_execute", capture)
+        return len(captured), await explain()
+    finally:
+        await clean_up()
+
+
+async def main(users: int) -> None:
+    await db.init(config=Config.get())
+    try:
+        statements, full_scans = await audit(users)
+    finally:
+        await db.dispose_engines()
+    print(f"{statements} statements, {full_scans} full table scans")
+    if full_scans:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--users", type=int, default=5000)
+    args = parser.parse_args()
+    run(main(users=args.users))
@@ -0,0 +1,90 @@
+"""
+Rows/sec of inserting users through the unit of work (Mixin.add_all) and
+through chunked Core executemany (Mixin.bulk_insert / bulk_upsert).
+
+Usage: API_ENV=test python -m benchmarks.bench_bulk_insert --rows 100000 --orm-rows 10000
+"""
+from argparse import ArgumentParser
+from asyncio import run
+from time import perf_counter
+from typing import AsyncIterator, Awaitable, Callable, List
+from sqlalchemy import delete
+from app.common.config import Config
+from app.database.schema import db, Users
+
+
+def user_rows(label: str, count: int) -> List[dict]:
+    return [
+        {"email": f"{label}{i}@bench.test", "password": "bench", "name": label}
+        for i in range(count)
+    ]
+
+
+async def user_row_stream(label: str, count: int) -> AsyncIterator[dict]:
+    for row in user_rows(label, count):
+        yield row
+
+
+async def timed(label: str, rows: int, func: Callable[[], Awaitable]) -> None:
+    start = perf_counter()
+    await func()
+    elapsed = perf_counter() - start
+    print(
+        f"{label:<28}: {rows:>7} rows in {elapsed:7.3f} s ({rows / elapsed:>9.0f} rows/s)"
+    )
+
+
+async def main(rows: int, orm_rows: int, chunk_size: int) -> None:
+    await db.init(config=Config.get())
+    await timed(
+        "add_all (unit of work)",
+        orm_rows,
+        lambda: Users.add_all(*user_rows("orm", orm_rows), autocommit=True),
+    )
+    await timed(
+        "bulk_insert",
+        rows,
+        lambda: Users.bulk_insert(
+            user_rows("bulk", rows), chunk_size=chunk_size, autocommit=True
+        ),
+    )
+    ids: List[int] = []
+
+    async def bulk_insert_returning_ids() -> None:
+        ids.extend(
+            await Users.bulk_insert(
+                user_row_stream("ids", rows),
+                chunk_size=chunk_size,
+                return_ids=True,
+                autocommit=True,
+            )
+        )
+
+    await timed("bulk_insert (return_ids)", rows, bulk_insert_returning_ids)
+    if db.engine.dialect.name == "mysql":  # Every row hits a duplicate primary key
+        await timed(
+            "bulk_upsert (all updated)",
+            rows,
+            lambda: Users.bulk_upsert(
+                (
+                    {"id": user_id, "email": f"ids{i}@bench.test", "name": "upsert"}
+                    for i, user_id in enumerate(ids)
+                ),
+                update_columns=["name"],
+                chunk_size=chunk_size,
+                autocommit=True,
+            ),
+        )
+    await db.execute(
+        delete(Users).where(Users.email.like("%@bench.test")), autocommit=True
+    )
+    await db.dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--orm-rows", type=int, default=10000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+    run(main(rows=args.rows, orm_rows=args.orm_rows, chunk_size=args.chunk_size))
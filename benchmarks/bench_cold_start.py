@@ -0,0 +1,49 @@
+"""
+Cold start of a worker: importing the app (no DB round trip since DB is
+initiated at startup, not at import) and running the startup, which
+bootstraps DB under an advisory lock and creates the engines.
+Each run is a fresh interpreter.
+
+Usage: API_ENV=test python -m benchmarks.bench_cold_start --runs 5
+"""
+from argparse import ArgumentParser
+from statistics import median
+from subprocess import run
+from sys import executable
+from typing import List
+
+WORKER = """
+from time import perf_counter
+started_at = perf_counter()
+from app.common.app_settings import create_app
+from app.common.config import Config
+from app.database.schema import db
+app = create_app(Config.get())
+imported = perf_counter() - started_at
+import asyncio
+async def main():
+    await db.init(config=Config.get())
+    await db.dispose_engines()
+asyncio.run(main())
+print(imported, db.init_seconds)
+"""
+
+
+def main(runs: int) -> None:
+    imports: List[float] = []
+    inits: List[float] = []
+    for _ in range(runs):
+        output = run(
+            [executable, "-c", WORKER], capture_output=True, text=True, check=True
+        ).stdout.split()
+        imports.append(float(output[-2]))
+        inits.append(float(output[-1]))
+    print(f"import + create_app : {median(imports) * 1000:8.1f} ms (median)")
+    print(f"db.init             : {median(inits) * 1000:8.1f} ms (median)")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    main(runs=args.runs)
@@ -0,0 +1,159 @@
+"""
+Requests/sec of /api/services and /api/user/me through the security middlewares,
+before (TrustedHost -> CORS -> BaseHTTPMiddleware) and after (AccessControlMiddleware).
+
+Usage: API_ENV=test python -m benchmarks.bench_middleware --requests 2000 --concurrency 20
+"""
+from argparse import ArgumentParser
+from asyncio import gather, run
+from time import perf_counter, time
+from typing import Callable, Dict
+from uuid import uuid4
+from httpx import AsyncClient
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from app.common.app_settings import create_app
+from app.common.config import Config, EXCEPT_PATH_LIST, EXCEPT_PATH_REGEX
+from app.database.crud import create_api_key
+from app.database.schema import db, Users
+from app.errors import exceptions as ex
+from app.middlewares.token_validator import (
+    exception_handler,
+    queries_params_to_key_and_timestamp,
+    url_pattern_check,
+    validate_access_key,
+)
+from app.middlewares.trusted_hosts import TrustedHostMiddleware
+from app.models import AddApiKey, UserToken
+from app.utils.date_utils import UTC
+from app.utils.encoding_and_hashing import create_access_token, hash_params
+from app.utils.logger import api_logger
+from app.utils.query_utils import parse_params
+
+
+async def legacy_access_control(request: Request, call_next: RequestResponseEndpoint):
+    # The former BaseHTTPMiddleware dispatch, reduced to the benchmarked paths
+    headers = request.headers
+    url = request.url.path
+    query_params = str(request.query_params)
+    request.state.start = time()
+    request.state.inspect = None
+    request.state.user = None
+    request.state.ip = request.client.host
+    if await url_pattern_check(url, EXCEPT_PATH_REGEX) or url in EXCEPT_PATH_LIST:
+        return await call_next(request)
+    error = None
+    try:
+        if url.startswith("/api/services"):
+            access_key, timestamp = await queries_params_to_key_and_timestamp(
+                query_params
+            )
+            if "secret" not in headers.keys():
+                raise ex.APIHeaderInvalidEx()
+            request.state.user = await validate_access_key(
+                access_key,
+                query_from_session=True,
+                query_check=True,
+                query_params=query_params,
+                secret=headers["secret"],
+                timestamp=timestamp,
+                ip=request.state.ip,
+            )
+        else:
+            if "authorization" not in headers.keys():
+                raise ex.NotAuthorized()
+            request.state.user = await validate_access_key(headers["authorization"])
+        response = await call_next(request)
+    except Exception as exception:
+        error = await exception_handler(exception)
+        response = JSONResponse(status_code=error.status_code, content={})
+    if url.startswith("/api/services") or error is not None:
+        api_logger(request=request, status_code=response.status_code, error=error)
+    return response
+
+
+def create_legacy_app(config: Config):
+    legacy_app = create_app(config)
+    legacy_app.user_middleware = [
+        Middleware(
+            TrustedHostMiddleware,
+            allowed_hosts=config.trusted_hosts,
+            except_path=["/health"],
+        ),
+        Middleware(
+            CORSMiddleware,
+            allow_origins=config.allowed_sites,
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+        ),
+        Middleware(BaseHTTPMiddleware, dispatch=legacy_access_control),
+    ]
+    legacy_app.middleware_stack = legacy_app.build_middleware_stack()
+    return legacy_app
+
+
+async def measure(
+    app, make_request: Callable[[], Dict], requests: int, concurrency: int
+) -> float:
+    async with AsyncClient(app=app, base_url="http://localhost") as client:
+
+        async def worker(count: int) -> None:
+            for _ in range(count):
+                res = await client.get(**make_request())
+                assert res.status_code in (200, 307), res.text
+
+        await worker(10)  # Warm up caches and the connection pool
+        start = perf_counter()
+        await gather(*(worker(requests // concurrency) for _ in range(concurrency)))
+        return requests // concurrency * concurrency / (perf_counter() - start)
+
+
+async def main(requests: int, concurrency: int) -> None:
+    config = Config.get()
+    await db.init(config=config)
+    random_8_digits = str(hash(uuid4()))[:8]
+    user: Users = await Users.add_one(
+        autocommit=True, refresh=True, email=f"{random_8_digits}@bench.com"
+    )
+    api_key = await create_api_key(
+        user_id=user.id, additional_key_info=AddApiKey(user_memo="[Benchmark]")
+    )
+    access_token = create_access_token(
+        data=UserToken.from_orm(user).dict(), expires_delta=1
+    )
+
+    def services_request() -> Dict:
+        qs = parse_params(
+            params={"key": api_key.access_key, "timestamp": UTC.timestamp(hour_diff=9)}
+        )
+        return {
+            "url": f"/api/services?{qs}",
+            "headers": {"secret": hash_params(qs=qs, secret_key=api_key.secret_key)},
+        }
+
+    def user_me_request() -> Dict:
+        return {
+            "url": "/api/user/me",
+            "headers": {"Authorization": f"Bearer {access_token}"},
+        }
+
+    apps = {"before": create_legacy_app(config), "after": create_app(config)}
+    for path, make_request in (
+        ("/api/services", services_request),
+        ("/api/user/me", user_me_request),
+    ):
+        for label, app in apps.items():
+            rps = await measure(app, make_request, requests, concurrency)
+            print(f"{path:<16}{label:<8}{rps:>10.1f} req/s")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    run(main(requests=args.requests, concurrency=args.concurrency))
@@ -0,0 +1,83 @@
+"""
+Latency of an unrelated endpoint during a login storm, with bcrypt called inline
+in the handler (before) and through PasswordHasher's thread pool (after).
+
+Usage: python -m benchmarks.bench_password_hashing --logins 40 --rounds 12
+"""
+from argparse import ArgumentParser
+from asyncio import create_task, gather, run, sleep
+from statistics import quantiles
+from time import perf_counter
+from typing import List
+import bcrypt
+from fastapi import FastAPI
+from httpx import AsyncClient
+from app.utils.encoding_and_hashing import PasswordHasher
+
+
+def create_bench_app(hasher: PasswordHasher) -> FastAPI:
+    bench_app = FastAPI()
+    hashed_password: str = bcrypt.hashpw(
+        b"password", bcrypt.gensalt(hasher.rounds)
+    ).decode("utf-8")
+
+    @bench_app.get("/ping")
+    async def ping():
+        return {"pong": True}
+
+    @bench_app.post("/login/inline")
+    async def login_inline():
+        return {"ok": bcrypt.checkpw(b"password", hashed_password.encode("utf-8"))}
+
+    @bench_app.post("/login/offloaded")
+    async def login_offloaded():
+        return {"ok": await hasher.check("password", hashed_password)}
+
+    return bench_app
+
+
+async def measure(client: AsyncClient, login_path: str, logins: int) -> List[float]:
+    # Pings are scheduled on a fixed 5ms grid and timed from their scheduled start,
+    # so that time spent waiting for a blocked event loop is counted as latency.
+    latencies: List[float] = []
+
+    async def ping(scheduled: float) -> None:
+        await client.get("/ping")
+        latencies.append((perf_counter() - scheduled) * 1000)
+
+    storm = gather(*(client.post(login_path) for _ in range(logins)))
+    pings, start = [], perf_counter()
+    while not storm.done():
+        scheduled = start + len(pings) * 0.005
+        await sleep(max(0.0, scheduled - perf_counter()))
+        pings.append(create_task(ping(scheduled)))
+    await gather(storm, *pings)
+    return latencies
+
+
+async def main(logins: int, rounds: int, max_concurrency: int) -> None:
+    hasher = PasswordHasher(rounds=rounds, max_concurrency=max_concurrency)
+    async with AsyncClient(app=create_bench_app(hasher), base_url="http://b") as client:
+        for label, login_path in (
+            ("before", "/login/inline"),
+            ("after", "/login/offloaded"),
+        ):
+            latencies = await measure(client, login_path, logins)
+            percentiles = (
+                quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+            )
+            print(
+                f"/ping during {logins} logins ({label:<6}): "
+                f"samples={len(latencies):<5} p50={percentiles[49]:8.1f}ms "
+                f"p99={percentiles[98]:8.1f}ms max={max(latencies):8.1f}ms"
+            )
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--max-concurrency", type=int, default=2)
+    args = parser.parse_args()
+    run(main(args.logins, args.rounds, args.max_concurrency))
@@ -0,0 +1,67 @@
+"""
+Time and allocated memory per call of reading API keys of a user as ORM
+instances (fetchall_filtered_by) and as rows of the listed columns only
+(fetchall_rows_filtered_by).
+
+Usage: API_ENV=test python -m benchmarks.bench_read_models --calls 2000 --keys 100
+"""
+from argparse import ArgumentParser
+from asyncio import run
+from time import perf_counter
+from tracemalloc import get_traced_memory, reset_peak, start, stop
+from typing import Any, Awaitable, Callable
+from sqlalchemy import delete
+from app.common.config import Config
+from app.database.crud import API_KEY_LIST_COLUMNS
+from app.database.schema import db, ApiKeys, Users
+
+
+async def timed(label: str, calls: int, func: Callable[[], Awaitable[Any]]) -> None:
+    start_time = perf_counter()
+    for _ in range(calls):
+        await func()
+    elapsed = perf_counter() - start_time
+    start()  # Peak memory of a single call, measured apart from its time
+    reset_peak()
+    await func()
+    peak = get_traced_memory()[1]
+    stop()
+    print(
+        f"{label:<7}: {elapsed / calls * 1e6:9.2f} us/call, {peak / 1024:8.1f} KiB peak"
+    )
+
+
+async def main(calls: int, keys: int) -> None:
+    await db.init(config=Config.get())
+    user: Users = await Users.add_one(autocommit=True, email="read@bench.test")
+    await ApiKeys.bulk_insert(
+        [
+            {"user_id": user.id, "access_key": f"read-{i}", "secret_key": "bench"}
+            for i in range(keys)
+        ],
+        autocommit=True,
+    )
+    async with db.session() as session:  # Same connection, to isolate Python cost
+        await timed(
+            "orm",
+            calls,
+            lambda: ApiKeys.fetchall_filtered_by(session=session, user_id=user.id),
+        )
+        await timed(
+            "rows",
+            calls,
+            lambda: ApiKeys.fetchall_rows_filtered_by(
+                *API_KEY_LIST_COLUMNS, session=session, user_id=user.id
+            ),
+        )
+    await db.execute(delete(ApiKeys).filter_by(user_id=user.id), autocommit=True)
+    await db.delete(user, autocommit=True)
+    await db.dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--keys", type=int, default=100)
+    args = parser.parse_args()
+    run(main(calls=args.calls, keys=args.keys))
@@ -0,0 +1,83 @@
+"""
+Per-call overhead of the SQLAlchemy wrapper's session runners, building a wrapper
+closure on every call (before) and using the runners built once (after),
+and round trips of add_all(refresh=True) with serial and batched refresh.
+
+Usage: API_ENV=test python -m benchmarks.bench_session_runner --calls 200000 --rows 100
+"""
+from argparse import ArgumentParser
+from asyncio import run
+from time import perf_counter
+from typing import Any, List
+from sqlalchemy import event, select
+from app.common.config import Config
+from app.database.schema import db, Users
+
+
+class NullSession:
+    # Returns immediately, so that only the wrapper itself is measured
+    async def scalar(self, stmt: Any) -> None:
+        return None
+
+
+async def measure_wrapper_overhead(calls: int) -> None:
+    session, stmt = NullSession(), select(Users.id)
+    start = perf_counter()
+    for _ in range(calls):
+        await db.run_in_session(db._scalar)(session, stmt=stmt)
+    per_call_closure = (perf_counter() - start) / calls
+    start = perf_counter()
+    for _ in range(calls):
+        await db.scalar(stmt, session=session)
+    precompiled = (perf_counter() - start) / calls
+    print(f"closure per call : {per_call_closure * 1e6:.3f} us/call")
+    print(f"precompiled      : {precompiled * 1e6:.3f} us/call")
+
+
+async def measure_refresh(rows: int) -> None:
+    statements: List[str] = []
+
+    def count_statement(conn, cursor, statement, *args) -> None:
+        statements.append(statement)
+
+    event.listen(db.engine.sync_engine, "before_cursor_execute", count_statement)
+    try:
+        for label, batched in (("serial refresh ", False), ("batched refresh", True)):
+            values = [
+                {"email": f"bench{i}@{label[:6]}.test", "password": "bench"}
+                for i in range(rows)
+            ]
+            statements.clear()
+            start = perf_counter()
+            async with db.session() as session:
+                users = await Users.add_all(*values, autocommit=True, session=session)
+                if batched:
+                    await db.refresh_all(session, users)
+                else:
+                    for user in users:
+                        await session.refresh(user)
+                elapsed, round_trips = perf_counter() - start, len(statements)
+                await session.execute(
+                    Users.__table__.delete().where(
+                        Users.id.in_([user.id for user in users])
+                    )
+                )
+                await session.commit()
+            print(f"{label}  : {round_trips} statements, {elapsed * 1000:.1f} ms")
+    finally:
+        event.remove(db.engine.sync_engine, "before_cursor_execute", count_statement)
+
+
+async def main(calls: int, rows: int) -> None:
+    await db.init(config=Config.get())
+    await measure_wrapper_overhead(calls)
+    await measure_refresh(rows)
+    await db.dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--rows", type=int, default=100)
+    args = parser.parse_args()
+    run(main(calls=args.calls, rows=args.rows))
@@ -0,0 +1,71 @@
+"""
+Python-side overhead per Mixin.first_filtered_by query, building
+select(cls).filter_by(**kwargs) on every call (before) and reusing the cached
+statement with bind parameters (after).
+The statement-only numbers include what SQLAlchemy does before reaching the
+driver: building the statement and generating its cache key.
+
+Usage: API_ENV=test python -m benchmarks.bench_statement_cache --calls 20000
+"""
+from argparse import ArgumentParser
+from asyncio import run
+from time import perf_counter
+from typing import Any, Awaitable, Callable
+from sqlalchemy import select
+from app.common.config import Config
+from app.database.schema import db, Users
+
+
+def measure_statements(calls: int) -> None:
+    start = perf_counter()
+    for index in range(calls):
+        stmt = select(Users).filter_by(email=f"{index}@bench.test").limit(1)
+        stmt._generate_cache_key()
+    rebuilt = (perf_counter() - start) / calls
+    start = perf_counter()
+    for index in range(calls):
+        stmt, params = Users._select_filtered_by("first", email=f"{index}@bench.test")
+        stmt._generate_cache_key()
+    cached = (perf_counter() - start) / calls
+    print(f"statement, rebuilt : {rebuilt * 1e6:8.2f} us/call")
+    print(f"statement, cached  : {cached * 1e6:8.2f} us/call")
+
+
+async def timed(label: str, calls: int, func: Callable[[int], Awaitable[Any]]) -> None:
+    start = perf_counter()
+    for index in range(calls):
+        await func(index)
+    elapsed = perf_counter() - start
+    print(
+        f"{label:<19}: {elapsed / calls * 1e6:8.2f} us/call ({calls / elapsed:.0f}/s)"
+    )
+
+
+async def main(calls: int) -> None:
+    await db.init(config=Config.get())
+    measure_statements(calls)
+    user: Users = await Users.add_one(
+        autocommit=True, refresh=True, email="cache@bench.test", password="bench"
+    )
+    async with db.session() as session:  # Same connection, to isolate Python cost
+
+        async def rebuilt(_: int) -> Users:
+            return await db.scalars__first(
+                stmt=select(Users).filter_by(email=user.email).limit(1),
+                session=session,
+            )
+
+        async def cached(_: int) -> Users:
+            return await Users.first_filtered_by(session=session, email=user.email)
+
+        await timed("query, rebuilt", calls, rebuilt)
+        await timed("query, cached", calls, cached)
+    await db.delete(user, autocommit=True)
+    await db.dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+    run(main(calls=args.calls))
@@ -2,6 +2,7 @@ from typing import Any
 from uuid import uuid4
 
 from sqlalchemy import select
+from app.common.config import Config
 from app.database.schema import db, Users
 
 
@@ -9,6 +10,8 @@ if __name__ == "__main__":
     from asyncio import run
 
     async def main() -> None:
+        await db.init(config=Config.get())
+
         def log(result: Any, logged_as: str) -> None:
             outputs.append({logged_as: result})
 
@@ -76,7 +79,6 @@ if __name__ == "__main__":
             print("Detailed error:\n")
             raise e
         finally:
-            await db.session.close()
             await db.engine.dispose()
             print("==" * 10, "Outputs", "==" * 10)
             for output in outputs:
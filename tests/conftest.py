@@ -1,13 +1,15 @@
 from os import environ
 
 environ["API_ENV"] = "test"
-from typing import AsyncGenerator
+from contextlib import contextmanager
+from typing import AsyncGenerator, Callable, ContextManager
 import pytest
 from httpx import AsyncClient
 import pytest_asyncio
 from uuid import uuid4
 from os import environ
-from app.database.schema import Users
+from app.database.query_stats import QueryStats, track_queries
+from app.database.schema import db, Users
 from app.common.app_settings import create_app
 from app.common.config import Config
 from app.models import UserToken
@@ -22,6 +24,10 @@ from app.routers.auth import create_access_token
 """
 
 
+def pytest_configure(config):
+    config.addinivalue_line("markers", "mysql: needs MySQL, not just any database")
+
+
 @pytest.fixture(scope="session")
 def app():
     _app = create_app(Config.get())
@@ -29,13 +35,20 @@ def app():
 
 
 @pytest_asyncio.fixture(scope="function")
-async def client(app) -> AsyncGenerator:
+async def database():
+    # The app initiates DB at startup, which AsyncClient does not run.
+    # Requested only by tests that need MySQL, so the rest run without a server
+    await db.init(config=Config.get())
+
+
+@pytest_asyncio.fixture(scope="function")
+async def client(app, database) -> AsyncGenerator:
     async with AsyncClient(app=app, base_url="http://localhost") as ac:
         yield ac
 
 
 @pytest_asyncio.fixture(scope="function")
-async def login_header(random_user):
+async def login_header(database, random_user):
     """
     테스트 전 사용자 미리 등록
     """
@@ -56,3 +69,24 @@ def random_user():
         "name": f"{random_8_digits}",
         "phone_number": f"010{random_8_digits}",
     }
+
+
+@pytest.fixture(scope="function")
+def max_statements() -> Callable[[int], ContextManager[QueryStats]]:
+    """
+    Fails the test when the block issues more SQL statements than the budget:
+    with max_statements(2):
+        await client.get("api/user/me", headers=login_header)
+    """
+
+    @contextmanager
+    def check(budget: int):
+        with track_queries() as stats:
+            yield stats
+        assert (
+            stats.count <= budget
+        ), f"{stats.count} statements issued, budget is {budget}:\n" + "\n".join(
+            stats.statements.elements()
+        )
+
+    return check
@@ -0,0 +1,153 @@
+import pytest
+import pytest_asyncio
+from typing import AsyncGenerator
+from httpx import AsyncClient
+from sqlalchemy.exc import OperationalError
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route, Router
+from app.errors import exceptions as ex
+from app.middlewares.token_validator import AccessControlMiddleware, exception_handler
+from app.utils.encoding_and_hashing import create_access_token
+
+ALLOWED_SITE = "https://allowed.example"
+
+
+async def ok(request: Request) -> PlainTextResponse:
+    return PlainTextResponse("ok")
+
+
+async def me(request: Request) -> JSONResponse:
+    return JSONResponse({"email": request.state.user.email})
+
+
+async def sql_failure(request: Request) -> None:
+    raise OperationalError("SELECT 1", {}, Exception("gone away"))
+
+
+async def unexpected_failure(request: Request) -> None:
+    raise ValueError("unexpected")
+
+
+async def api_failure(request: Request) -> None:
+    raise ex.NotFoundUserEx(user_id=1)
+
+
+# A bare router, so that errors reach the middleware instead of an error handler
+app = AccessControlMiddleware(
+    Router(
+        routes=[
+            Route("/", ok),
+            Route("/health", ok),
+            Route("/api/auth/ping", ok),
+            Route("/api/me", me),
+            Route("/api/sql-failure", sql_failure),
+            Route("/api/unexpected-failure", unexpected_failure),
+            Route("/api/api-failure", api_failure),
+        ]
+    ),
+    trusted_hosts=["localhost"],
+    allowed_sites=[ALLOWED_SITE],
+    except_path=["/health"],
+)
+
+
+@pytest_asyncio.fixture(scope="function")
+async def access_client() -> AsyncGenerator:
+    async with AsyncClient(app=app, base_url="http://localhost") as client:
+        yield client
+
+
+@pytest.mark.asyncio
+async def test_rejected_host(access_client: AsyncClient):
+    res = await access_client.get("/", headers={"host": "evil.example"})
+    assert res.status_code == 400
+    assert res.text == "Invalid host header"
+
+    # Paths excepted from the host check, e.g. health checks by a load balancer,
+    # go on to the token check
+    res = await access_client.get("/health", headers={"host": "10.0.0.1"})
+    assert res.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_cors(access_client: AsyncClient):
+    preflight_headers = {"access-control-request-method": "GET"}
+    res = await access_client.options(
+        "/api/me", headers={"origin": ALLOWED_SITE, **preflight_headers}
+    )
+    assert res.status_code == 200
+    assert res.headers["access-control-allow-origin"] == ALLOWED_SITE
+    assert res.headers["access-control-allow-credentials"] == "true"
+
+    res = await access_client.options(
+        "/api/me", headers={"origin": "https://evil.example", **preflight_headers}
+    )
+    assert res.status_code == 400
+    assert "access-control-allow-origin" not in res.headers
+
+    # Simple requests get the CORS headers on the actual response
+    res = await access_client.get("/api/auth/ping", headers={"origin": ALLOWED_SITE})
+    assert res.status_code == 200
+    assert res.headers["access-control-allow-origin"] == ALLOWED_SITE
+
+
+@pytest.mark.asyncio
+async def test_except_path(access_client: AsyncClient):
+    for url in ("/", "/api/auth/ping"):
+        res = await access_client.get(url)
+        assert res.status_code == 200, url
+        assert res.text == "ok"
+
+    res = await access_client.get("/api/me")
+    assert res.status_code == 401
+    assert res.json()["code"] == ex.NotAuthorized().code
+
+    res = await access_client.get(
+        "/api/me", headers={"authorization": "Bearer invalid"}
+    )
+    assert res.status_code == 400
+    assert res.json()["code"] == ex.TokenDecodeEx(ex=None).code
+
+    token = create_access_token(data={"id": 1, "email": "me@test.com"}, expires_delta=1)
+    res = await access_client.get(
+        "/api/me", headers={"authorization": f"Bearer {token}"}
+    )
+    assert res.status_code == 200
+    assert res.json() == {"email": "me@test.com"}
+
+
+@pytest.mark.asyncio
+async def test_error_response(access_client: AsyncClient):
+    token = create_access_token(data={"id": 1, "email": "me@test.com"}, expires_delta=1)
+    headers = {"authorization": f"Bearer {token}"}
+    for url, expected in (
+        ("/api/sql-failure", ex.SqlFailureEx()),
+        ("/api/unexpected-failure", ex.APIException()),
+        ("/api/api-failure", ex.NotFoundUserEx(user_id=1)),
+    ):
+        res = await access_client.get(url, headers=headers)
+        assert res.status_code == expected.status_code, url
+        assert res.json() == {
+            "status": expected.status_code,
+            "msg": expected.msg,
+            "detail": res.json()["detail"],
+            "code": expected.code,
+        }, url
+
+
+@pytest.mark.asyncio
+async def test_exception_handler():
+    sql_error = OperationalError("SELECT 1", {}, Exception("gone away"))
+    error = await exception_handler(sql_error)
+    assert isinstance(error, ex.SqlFailureEx)
+    assert error.status_code == 500
+    assert error.ex is sql_error
+
+    api_error = ex.NotFoundUserEx(user_id=1)
+    assert await exception_handler(api_error) is api_error
+
+    error = await exception_handler(ValueError("unexpected"))
+    assert type(error) is ex.APIException
+    assert error.status_code == 500
+    assert error.detail == "unexpected"
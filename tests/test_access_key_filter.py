@@ -0,0 +1,89 @@
+import pytest
+from time import monotonic
+from sqlalchemy import delete
+from app.database import access_key_filter as access_key_filter_module
+from app.database.access_key_filter import AccessKeyFilter
+from app.database.schema import db, ApiKeys, Users
+
+pytestmark = pytest.mark.usefixtures("database")
+
+
+def make_filter(refresh_interval: float) -> AccessKeyFilter:
+    return AccessKeyFilter(
+        capacity=1000,
+        error_rate=0.001,
+        refresh_interval=refresh_interval,
+        refresh_overlap=60,
+        negative_cache_maxsize=100,
+        negative_cache_ttl=30,
+    )
+
+
+@pytest.fixture(scope="function")
+def key_filter() -> AccessKeyFilter:
+    # Refreshes on every miss, to test what a refresh pulls in
+    return make_filter(refresh_interval=0)
+
+
+async def insert_keys(user_id: int, *access_keys: str, **columns) -> None:
+    # As another worker would: not through this filter
+    await ApiKeys.bulk_insert(
+        [
+            {"user_id": user_id, "access_key": key, "secret_key": "filter", **columns}
+            for key in access_keys
+        ],
+        autocommit=True,
+    )
+
+
+@pytest.mark.asyncio
+async def test_key_created_by_another_worker(key_filter, random_user):
+    user: Users = await Users.add_one(autocommit=True, **random_user)
+    await key_filter.build()
+    try:
+        await insert_keys(user.id, f"other-worker-{user.id}")
+        assert await key_filter.might_exist(f"other-worker-{user.id}")
+        refreshes = key_filter.refreshes
+        assert not await key_filter.might_exist(f"unknown-{user.id}")
+        assert not await key_filter.might_exist(f"unknown-{user.id}")
+        assert key_filter.refreshes == refreshes + 1  # Then negatively cached
+    finally:
+        await db.execute(delete(ApiKeys).filter_by(user_id=user.id), autocommit=True)
+
+
+@pytest.mark.asyncio
+async def test_key_committed_out_of_id_order(key_filter, random_user):
+    user: Users = await Users.add_one(autocommit=True, **random_user)
+    await key_filter.build()
+    try:
+        await insert_keys(user.id, f"higher-id-{user.id}", id=user.id * 1000 + 10)
+        assert await key_filter.might_exist(f"higher-id-{user.id}")
+        # A lower id, committed after the higher one was seen
+        await insert_keys(user.id, f"lower-id-{user.id}", id=user.id * 1000 + 5)
+        assert await key_filter.might_exist(f"lower-id-{user.id}")
+    finally:
+        await db.execute(delete(ApiKeys).filter_by(user_id=user.id), autocommit=True)
+
+
+@pytest.mark.asyncio
+async def test_refresh_interval(random_user, monkeypatch):
+    key_filter = make_filter(refresh_interval=60)
+    user: Users = await Users.add_one(autocommit=True, **random_user)
+    await key_filter.build()
+    try:
+        await insert_keys(user.id, f"other-worker-{user.id}")
+        # Within the interval, misses are rejected without a refresh
+        for i in range(20):
+            assert not await key_filter.might_exist(f"unknown-{user.id}-{i}")
+        assert not await key_filter.might_exist(f"other-worker-{user.id}")
+        assert key_filter.refreshes == 0
+
+        monkeypatch.setattr(
+            access_key_filter_module, "monotonic", lambda: monotonic() + 61
+        )
+        for i in range(20, 40):
+            assert not await key_filter.might_exist(f"unknown-{user.id}-{i}")
+        assert key_filter.refreshes == 1  # Only the first miss after the interval
+        assert await key_filter.might_exist(f"other-worker-{user.id}")
+    finally:
+        await db.execute(delete(ApiKeys).filter_by(user_id=user.id), autocommit=True)
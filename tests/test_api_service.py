@@ -1,18 +1,24 @@
 import pytest
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError
+from app.database import crud
 from time import sleep
+from app.database.schema import db, ApiKeys
 from app.utils.date_utils import UTC
-from app.utils.encoding_and_hashing import hash_params
+from time import time
+from app.utils.encoding_and_hashing import hash_params, hash_params_v2
 from app.utils.query_utils import parse_params
 
 
 @pytest.mark.asyncio
-async def test_request_api(login_header, client):
+async def test_request_api(login_header, client, max_statements):
     async def _get_apikey(client, authorized_header):
-        res = await client.post(
-            "api/user/apikeys",
-            json={"user_memo": "user1__key"},
-            headers=authorized_header,
-        )
+        with max_statements(2):
+            res = await client.post(
+                "api/user/apikeys",
+                json={"user_memo": "user1__key"},
+                headers=authorized_header,
+            )
         res_body = res.json()
         assert res.status_code == 200
         assert "access_key" in res_body
@@ -22,7 +28,8 @@ async def test_request_api(login_header, client):
             "secret_key": res_body["secret_key"],
         }
 
-        res = await client.get("api/user/apikeys", headers=authorized_header)
+        with max_statements(1):
+            res = await client.get("api/user/apikeys", headers=authorized_header)
         res_body = res.json()
         assert res.status_code == 200
         assert "user1__key" in res_body[0]["user_memo"]
@@ -38,3 +45,109 @@ async def test_request_api(login_header, client):
         headers={"secret": hash_params(qs=parsed_qs, secret_key=apikey["secret_key"])},
     )
     assert res.status_code in (200, 307)
+
+
+@pytest.mark.asyncio
+async def test_delete_apikey(login_header, client, max_statements):
+    res = await client.post(
+        "api/user/apikeys", json={"user_memo": "to delete"}, headers=login_header
+    )
+    api_key = res.json()
+    res = await client.post(
+        f"api/user/apikeys/{api_key['id']}/whitelists",
+        params={"api_key_id": api_key["id"]},
+        json={"ip_address": "10.0.0.1"},
+        headers=login_header,
+    )
+    whitelist_id = res.json()["id"]
+
+    with max_statements(2):
+        res = await client.delete(
+            f"api/user/apikeys/{api_key['id']}/whitelists/{whitelist_id}",
+            params={"api_key_id": api_key["id"], "whitelist_id": whitelist_id},
+            headers=login_header,
+        )
+    assert res.status_code == 200
+    with max_statements(2):
+        res = await client.delete(
+            f"api/user/apikeys/{api_key['id']}",
+            params={"access_key": api_key["access_key"]},
+            headers=login_header,
+        )
+    assert res.status_code == 200
+    res = await client.get("api/user/apikeys", headers=login_header)
+    assert res.json() == []
+
+
+@pytest.mark.asyncio
+async def test_request_api_v2(login_header, client):
+    res = await client.post(
+        "api/user/apikeys", json={"user_memo": "v2"}, headers=login_header
+    )
+    api_key = res.json()
+    key, msg, timestamp = api_key["access_key"], "hello%20%EC%95%88%EB%85%95", time()
+    # Sent unsorted and percent-encoded, signed sorted by key with values as sent
+    query_string = f"timestamp={int(timestamp)}&msg={msg}&key={key}"
+    canonical_qs = f"key={key}&msg={msg}&timestamp={int(timestamp)}"
+    secret = hash_params_v2(qs=canonical_qs, secret_key=api_key["secret_key"])
+
+    res = await client.get(
+        f"/api/services?{query_string}",
+        headers={"secret": secret, "signature-version": "2"},
+    )
+    assert res.status_code in (200, 307)
+    res = await client.get(  # Signed as sent, not canonical
+        f"/api/services?{query_string}",
+        headers={
+            "secret": hash_params_v2(qs=query_string, secret_key=api_key["secret_key"]),
+            "signature-version": "2",
+        },
+    )
+    assert res.status_code == 400
+    res = await client.get(
+        f"/api/services?{query_string}",
+        headers={"secret": "시크릿".encode("utf-8"), "signature-version": "2"},
+    )
+    assert res.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_whitelisted_api_key(login_header, client):
+    res = await client.post(
+        "api/user/apikeys", json={"user_memo": "whitelisted"}, headers=login_header
+    )
+    api_key = res.json()
+    await db.execute(
+        update(ApiKeys).filter_by(id=api_key["id"]).values(is_whitelisted=True),
+        autocommit=True,
+    )
+
+    async def request_api():
+        query_string = f"key={api_key['access_key']}&timestamp={int(time())}"
+        secret = hash_params_v2(qs=query_string, secret_key=api_key["secret_key"])
+        return await client.get(
+            f"/api/services?{query_string}",
+            headers={"secret": secret, "signature-version": "2"},
+        )
+
+    assert (await request_api()).status_code == 403  # Client is not whitelisted
+    res = await client.post(
+        f"api/user/apikeys/{api_key['id']}/whitelists",
+        params={"api_key_id": api_key["id"]},
+        json={"ip_address": "127.0.0.1"},
+        headers=login_header,
+    )
+    assert res.status_code == 200
+    assert (await request_api()).status_code in (200, 307)
+
+
+@pytest.mark.asyncio
+async def test_list_query_error(login_header, client, monkeypatch):
+    async def failing_stream(*args, **kwargs):
+        raise OperationalError("SELECT", {}, Exception("Lost connection"))
+        yield
+
+    monkeypatch.setattr(crud, "stream_api_keys", failing_stream)
+    res = await client.get("api/user/apikeys", headers=login_header)
+    assert res.status_code == 500  # Not a 200 with a truncated body
+    assert res.json()["status"] == 500
@@ -1,12 +1,34 @@
 from app.models import AddApiKey, UserToken
-from app.database.schema import Users, ApiKeys
-from app.database.crud import create_api_key, get_api_key_and_owner
+from sqlalchemy import event
+from sqlalchemy.exc import (
+    InvalidRequestError,
+    MultipleResultsFound,
+    NoResultFound,
+    OperationalError,
+)
+from app.database.schema import db, Users, ApiKeys
+from app.database.crud import (
+    api_key_cache,
+    create_api_key,
+    delete_api_key,
+    get_api_key_and_owner,
+    get_api_keys,
+    get_me,
+    invalidate_api_key_cache,
+)
+from app.database.single_flight import single_flight
+from app.errors.exceptions import NotFoundAccessKeyEx
 from app.middlewares.token_validator import validate_access_key
 from app.utils.date_utils import UTC
 from app.utils.query_utils import parse_params
-from app.utils.encoding_and_hashing import hash_params
+from app.utils.encoding_and_hashing import hash_params, hash_params_v2
+from datetime import datetime
+from time import time
+import asyncio
 import pytest
 
+pytestmark = pytest.mark.usefixtures("database")
+
 
 @pytest.mark.asyncio
 async def test_apikey_idenfitication(random_user):
@@ -22,6 +44,57 @@ async def test_apikey_idenfitication(random_user):
     assert random_user["email"] == matched_user.email
 
 
+@pytest.mark.asyncio
+async def test_apikey_cache_invalidation(random_user):
+    user: Users = await Users.add_one(autocommit=True, refresh=True, **random_user)
+    additional_key_info: AddApiKey = AddApiKey(user_memo="[Testing] test_apikey_cache")
+    new_api_key: ApiKeys = await create_api_key(
+        user_id=user.id, additional_key_info=additional_key_info
+    )
+    await get_api_key_and_owner(access_key=new_api_key.access_key)
+    cache_hits: int = api_key_cache.hits
+    await get_api_key_and_owner(access_key=new_api_key.access_key)
+    assert api_key_cache.hits == cache_hits + 1
+    await delete_api_key(
+        access_key_id=new_api_key.id,
+        access_key=new_api_key.access_key,
+        user_id=user.id,
+    )
+    with pytest.raises(NotFoundAccessKeyEx):
+        await get_api_key_and_owner(access_key=new_api_key.access_key)
+
+
+@pytest.mark.asyncio
+async def test_apikey_cache_invalidation_in_flight(random_user):
+    user: Users = await Users.add_one(autocommit=True, refresh=True, **random_user)
+    new_api_key: ApiKeys = await create_api_key(
+        user_id=user.id, additional_key_info=AddApiKey(user_memo="[Testing] in flight")
+    )
+    access_key: str = new_api_key.access_key
+    executed: int = single_flight.executed
+    started_before = asyncio.create_task(get_api_key_and_owner(access_key=access_key))
+    await asyncio.sleep(0)  # In flight
+    invalidate_api_key_cache(access_key=access_key)
+    # Not joined, as it may have read the key before the invalidation
+    started_after = asyncio.create_task(get_api_key_and_owner(access_key=access_key))
+    await asyncio.gather(started_before, started_after)
+    assert single_flight.executed == executed + 2
+    # Only the lookup started after the invalidation is cached
+    assert api_key_cache[access_key].api_key is started_after.result()[0]
+
+
+@pytest.mark.asyncio
+async def test_single_flight(random_user):
+    user: Users = await Users.add_one(autocommit=True, refresh=True, **random_user)
+    executed, coalesced = single_flight.executed, single_flight.coalesced
+    users = await asyncio.gather(*[get_me(user_id=user.id) for _ in range(10)])
+    assert all(matched_user.id == user.id for matched_user in users)
+    assert single_flight.executed == executed + 1
+    assert single_flight.coalesced == coalesced + 9
+    with pytest.raises(NotFoundAccessKeyEx):
+        await asyncio.gather(*[get_api_key_and_owner(access_key="") for _ in range(3)])
+
+
 @pytest.mark.asyncio
 async def test_apikey_query(random_user):
     user: Users = await Users.add_one(autocommit=True, refresh=True, **random_user)
@@ -42,3 +115,222 @@ async def test_apikey_query(random_user):
         timestamp=timestamp,
     )
     assert user_token.id == user.id
+
+
+@pytest.mark.asyncio
+async def test_apikey_query_v2(random_user):
+    user: Users = await Users.add_one(autocommit=True, refresh=True, **random_user)
+    additional_key_info: AddApiKey = AddApiKey(user_memo="[Testing] test_apikey_query")
+    new_api_key: ApiKeys = await create_api_key(
+        user_id=user.id, additional_key_info=additional_key_info
+    )
+    timestamp: str = str(int(time()))
+    parsed_qs: str = parse_params(
+        params={"key": new_api_key.access_key, "timestamp": timestamp}
+    )
+    for _ in range(2):  # Second one signs with the cached HMAC context
+        user_token: UserToken = await validate_access_key(
+            access_key=new_api_key.access_key,
+            query_from_session=True,
+            query_check=True,
+            secret=hash_params_v2(qs=parsed_qs, secret_key=new_api_key.secret_key),
+            query_params=parsed_qs,
+            timestamp=timestamp,
+            signature_version=2,
+        )
+        assert user_token.id == user.id
+
+
+@pytest.mark.asyncio
+async def test_bulk_insert(random_user):
+    rows = [
+        {"email": f"{index}{random_user['email']}", "password": "bulk"}
+        for index in range(25)
+    ]
+    ids = await Users.bulk_insert(rows, chunk_size=10, return_ids=True, autocommit=True)
+    assert len(ids) == len(set(ids)) == 25
+    users = await Users.fetchall_filtered(Users.id.in_(ids))
+    assert {user.email for user in users} == {row["email"] for row in rows}
+    assert all(user.status == "active" for user in users)
+
+
+@pytest.mark.asyncio
+async def test_bulk_insert_defaults_per_row(random_user, monkeypatch):
+    created_at = (datetime(2023, 1, 1, second=second) for second in range(60))
+    monkeypatch.setattr(
+        Users.__table__.c.created_at.default, "arg", lambda context: next(created_at)
+    )
+    rows = [{"email": f"{index}{random_user['email']}"} for index in range(5)]
+    ids = await Users.bulk_insert(rows, chunk_size=3, return_ids=True, autocommit=True)
+    users = await Users.fetchall_filtered(Users.id.in_(ids))
+    assert sorted(user.created_at.second for user in users) == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.asyncio
+async def test_bulk_insert_mismatched_keys(random_user):
+    rows = [{"email": f"{index}{random_user['email']}"} for index in range(3)]
+    rows[2]["name"] = "extra"
+    with pytest.raises(ValueError, match="Row 2"):
+        await Users.bulk_insert(rows, chunk_size=2, return_ids=True, autocommit=True)
+    assert (
+        await Users.fetchall_filtered(Users.email.like(f"%{random_user['email']}"))
+        == []
+    )
+
+
+@pytest.mark.asyncio
+async def test_bulk_insert_executemany(random_user):
+    async def rows():  # Chunked as they come
+        for index in range(25):
+            yield {"email": f"{index}{random_user['email']}", "password": "bulk"}
+
+    assert await Users.bulk_insert(rows(), chunk_size=10, autocommit=True) is None
+    users = await Users.fetchall_filtered(Users.email.like(f"%{random_user['email']}"))
+    assert len(users) == 25
+    assert all(user.status == "active" and user.created_at for user in users)
+
+
+@pytest.mark.asyncio
+async def test_bulk_upsert(random_user):
+    emails = [f"{index}{random_user['email']}" for index in range(5)]
+    inserted = await Users.bulk_upsert(
+        [{"email": email, "name": "before"} for email in emails[:3]], autocommit=True
+    )
+    assert inserted == 3
+    before = {
+        user.email: user.id
+        for user in await Users.fetchall_filtered(Users.email.in_(emails))
+    }
+    affected = await Users.bulk_upsert(
+        [{"email": email, "name": "after", "password": "new"} for email in emails],
+        update_columns=["name"],
+        chunk_size=2,
+        autocommit=True,
+    )
+    assert affected == 3 * 2 + 2  # MySQL counts an updated row twice
+    users = await Users.fetchall_filtered(Users.email.in_(emails))
+    assert len(users) == 5 and all(user.name == "after" for user in users)
+    for user in users:
+        if user.email in before:  # Updated in place, and only the given column
+            assert user.id == before[user.email] and user.password is None
+        else:
+            assert user.password == "new"
+
+
+@pytest.mark.asyncio
+async def test_keyset_pagination(random_user):
+    user: Users = await Users.add_one(autocommit=True, refresh=True, **random_user)
+    for _ in range(3):
+        await create_api_key(
+            user_id=user.id, additional_key_info=AddApiKey(user_memo="[Testing] page")
+        )
+    first_page = await ApiKeys.fetch_page_filtered_by(limit=2, user_id=user.id)
+    second_page = await ApiKeys.fetch_page_filtered_by(
+        cursor=first_page[-1].id, limit=2, user_id=user.id
+    )
+    streamed = [
+        api_key.id async for api_key in ApiKeys.stream_filtered_by(user_id=user.id)
+    ]
+    assert len(first_page) == 2 and len(second_page) == 1
+    assert streamed == [api_key.id for api_key in first_page + second_page]
+
+
+@pytest.mark.asyncio
+async def test_refresh_all(random_user, max_statements):
+    rows = [{"email": f"{index}{random_user['email']}"} for index in range(3)]
+    async with db.session() as session:
+        users = await Users.add_all(*rows, autocommit=True, session=session)
+        with max_statements(1):  # One SELECT ... IN for all of them
+            await db.refresh_all(session, users)
+        assert all(user.id and user.status == "active" for user in users)
+
+    with pytest.raises(InvalidRequestError):  # Pending, so nothing to refresh from
+        await Users.add_all(rows[0], refresh=True)
+
+
+@pytest.mark.asyncio
+async def test_request_scope(random_user):
+    checkouts = []
+    listener = lambda *args: checkouts.append(args)  # noqa: E731
+    event.listen(db.engine.sync_engine, "checkout", listener)
+    try:
+        async with db.request_scope():
+            user: Users = await Users.add_one(autocommit=True, **random_user)
+            await create_api_key(
+                user_id=user.id,
+                additional_key_info=AddApiKey(user_memo="[Testing] request_scope"),
+            )
+            assert len(await get_api_keys(user_id=user.id)) == 1
+    finally:
+        event.remove(db.engine.sync_engine, "checkout", listener)
+    assert len(checkouts) == 1
+
+
+@pytest.mark.asyncio
+async def test_request_scope_concurrent_calls(random_user):
+    user: Users = await Users.add_one(autocommit=True, **random_user)
+    async with db.request_scope() as scope:
+        # A session can't run these concurrently, so all but one get their own
+        users = await asyncio.gather(
+            *(Users.first_filtered_by(email=user.email) for _ in range(5))
+        )
+        assert [found.id for found in users] == [user.id] * 5
+        assert scope.depth == 0
+        assert (await Users.first_filtered_by(email=user.email)).id == user.id
+
+
+@pytest.mark.asyncio
+async def test_request_scope_close_failure(random_user):
+    async def failing_close() -> None:
+        raise OperationalError("ROLLBACK", {}, Exception("gone away"))
+
+    with pytest.raises(OperationalError):
+        async with db.request_scope() as scope:
+            await Users.first_filtered_by(email=random_user["email"])
+            scope.session.close = failing_close
+    assert scope.connection.closed  # Returned to the pool all the same
+
+
+@pytest.mark.asyncio
+async def test_row_reads(random_user):
+    user: Users = await Users.add_one(autocommit=True, **random_user)
+    row = await Users.first_row_filtered_by("id", "email", email=user.email)
+    assert tuple(row) == (user.id, user.email)
+    assert await Users.first_row_filtered_by("id", email="missing") is None
+    assert [tuple(row) for row in await get_api_keys(user_id=user.id)] == []
+
+
+@pytest.mark.asyncio
+async def test_filtered_by_statements(random_user):
+    first: Users = await Users.add_one(autocommit=True, **random_user)
+    second: Users = await Users.add_one(
+        autocommit=True,
+        email=f"2{random_user['email']}",
+        name=random_user["name"],
+        phone_number=None,
+    )
+    # Built once per filtered columns, whatever their values and order
+    stmt, params = Users._select_filtered_by("first", email=first.email, name="a")
+    assert Users._select_filtered_by("first", name="b", email=second.email)[0] is stmt
+    assert params == {"filter_email": first.email, "filter_name": "a"}
+    assert (await Users.first_filtered_by(email=first.email)).id == first.id
+    assert (await Users.first_filtered_by(email=second.email)).id == second.id
+
+    # None renders as IS NULL, so it is never bound to a cached statement
+    stmt, params = Users._select_filtered_by("first", phone_number=None)
+    assert params is None and "IS NULL" in str(stmt)
+    assert Users._select_filtered_by("first", phone_number=None)[0] is not stmt
+    found: Users = await Users.one_or_none_filtered_by(
+        name=random_user["name"], phone_number=None
+    )
+    assert found.id == second.id
+
+    # Two rows are enough for one() to tell there are more than one
+    assert Users._select_filtered_by("one", name="a")[0]._limit == 2
+    with pytest.raises(MultipleResultsFound):
+        await Users.one_filtered_by(name=random_user["name"])
+    with pytest.raises(MultipleResultsFound):
+        await Users.one_or_none_filtered_by(name=random_user["name"])
+    with pytest.raises(NoResultFound):
+        await Users.one_filtered_by(email="missing")
+    assert (await Users.one_filtered_by(email=first.email)).id == first.id
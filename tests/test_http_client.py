@@ -0,0 +1,75 @@
+import json
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from typing import Iterator, List
+from app.utils.http_client import AsyncHttpClient
+
+
+class StubKakaoHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive
+    statuses: List[int] = []  # Popped per request, 200 once exhausted
+    ports: List[int] = []  # Client port of each request
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.ports.append(self.client_address[1])
+        status = self.statuses.pop(0) if self.statuses else 200
+        body = json.dumps({"result_code": 0 if status == 200 else -1}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture(scope="function")
+def stub_server() -> Iterator[ThreadingHTTPServer]:
+    StubKakaoHandler.statuses, StubKakaoHandler.ports = [], []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubKakaoHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def stub_client(server: ThreadingHTTPServer, max_retries: int) -> AsyncHttpClient:
+    return AsyncHttpClient(
+        base_url=f"http://127.0.0.1:{server.server_port}",
+        connect_timeout=1.0,
+        read_timeout=1.0,
+        max_connections=2,
+        max_concurrency=2,
+        max_retries=max_retries,
+        retry_backoff=0.01,
+    )
+
+
+@pytest.mark.asyncio
+async def test_http_client_retries_and_reuses_connection(stub_server):
+    StubKakaoHandler.statuses = [503, 429]
+    http_client = stub_client(stub_server, max_retries=2)
+    try:
+        res = await http_client.post("/v2/api/talk/memo/default/send", data={"a": 1})
+        assert res.status_code == 200 and res.json()["result_code"] == 0
+        res = await http_client.post("/v2/api/talk/memo/default/send", data={"a": 2})
+        assert res.status_code == 200
+    finally:
+        await http_client.close()
+    assert len(set(StubKakaoHandler.ports)) == 1  # All over one kept-alive connection
+    assert http_client.stats["sent"] == 2 and http_client.stats["retried"] == 2
+
+
+@pytest.mark.asyncio
+async def test_http_client_gives_up_after_max_retries(stub_server):
+    StubKakaoHandler.statuses = [503, 503, 503]
+    http_client = stub_client(stub_server, max_retries=1)
+    try:
+        res = await http_client.post("/v2/api/talk/memo/default/send", data={"a": 1})
+    finally:
+        await http_client.close()
+    assert res.status_code == 503
+    assert len(StubKakaoHandler.ports) == 2
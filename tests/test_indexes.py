@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from benchmarks.audit_explain import audit
+from app.database.schema import db, ApiKeys, ApiWhiteLists, Users
+
+pytestmark = pytest.mark.usefixtures("database")
+
+
+@pytest.mark.asyncio
+async def test_unique_email(random_user):
+    await Users.add_one(autocommit=True, **random_user)
+    with pytest.raises(IntegrityError):
+        await Users.add_one(autocommit=True, email=random_user["email"])
+
+
+@pytest.mark.asyncio
+async def test_unique_whitelist_ip(random_user):
+    user: Users = await Users.add_one(autocommit=True, **random_user)
+    api_key_ids = await ApiKeys.bulk_insert(
+        [
+            {"user_id": user.id, "access_key": f"{i}-{user.id}", "secret_key": "ip"}
+            for i in range(2)
+        ],
+        return_ids=True,
+        autocommit=True,
+    )
+    try:
+        # The same IP for another key is fine
+        await ApiWhiteLists.bulk_insert(
+            [
+                {"api_key_id": key_id, "ip_address": "10.0.0.1"}
+                for key_id in api_key_ids
+            ],
+            autocommit=True,
+        )
+        with pytest.raises(IntegrityError):
+            await ApiWhiteLists.add_one(
+                autocommit=True, api_key_id=api_key_ids[0], ip_address="10.0.0.1"
+            )
+    finally:
+        await db.execute(
+            delete(ApiWhiteLists).filter(ApiWhiteLists.api_key_id.in_(api_key_ids)),
+            autocommit=True,
+        )
+        await db.execute(
+            delete(ApiKeys).filter(ApiKeys.id.in_(api_key_ids)), autocommit=True
+        )
+
+
+@pytest.mark.mysql
+@pytest.mark.asyncio
+async def test_no_full_table_scans():
+    if db.engine.dialect.name != "mysql":
+        pytest.skip("EXPLAIN output is MySQL's")
+    statements, full_scans = await audit(users=2000)
+    assert statements > 0
+    assert full_scans == 0
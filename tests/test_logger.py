@@ -0,0 +1,73 @@
+import json
+import logging
+import pytest
+from time import time
+from starlette.requests import Request
+from app.errors.exceptions import NotFoundUserEx
+from app.utils.logger import ApiLogWriter
+
+
+def make_request(path: str) -> Request:
+    request = Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "scheme": "http",
+            "server": ("localhost", 80),
+            "path": path,
+            "query_string": b"",
+            "headers": [(b"host", b"localhost")],
+        }
+    )
+    request.state.start = time()
+    request.state.ip = "127.0.0.1"
+    request.state.user = None
+    request.state.inspect = None
+    return request
+
+
+def make_writer(max_queue_size: int = 100) -> ApiLogWriter:
+    return ApiLogWriter(
+        max_queue_size=max_queue_size,
+        batch_size=10,
+        flush_interval=60,  # Only flushed by a full batch or stop() in these tests
+        success_sample_rate=1.0,
+    )
+
+
+@pytest.mark.asyncio
+async def test_flush_on_stop(caplog):
+    writer = make_writer()
+    caplog.set_level(logging.INFO)
+    for i in range(3):
+        writer.enqueue(make_request(f"/api/{i}"), 200, None, {})
+    writer.enqueue(make_request("/api/error"), None, NotFoundUserEx(user_id=1), {})
+    await writer.stop()
+    messages = [json.loads(record.getMessage()) for record in caplog.records]
+    assert [message["url"] for message in messages] == [
+        "localhost/api/0",
+        "localhost/api/1",
+        "localhost/api/2",
+        "localhost/api/error",
+    ]  # One record per log line
+    assert writer.stats["written"] == 4 and writer.stats["queue_size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_drop_when_full():
+    writer = make_writer(max_queue_size=2)
+    for i in range(5):  # Not awaiting, so the writer task never gets to run
+        writer.enqueue(make_request(f"/api/{i}"), 200, None, {})
+    assert writer.stats["queue_size"] == 2 and writer.stats["dropped"] == 3
+    await writer.stop()
+    assert writer.stats["written"] == 2
+
+
+@pytest.mark.asyncio
+async def test_enqueue_after_stop():
+    writer = make_writer()
+    writer.enqueue(make_request("/api/before"), 200, None, {})
+    await writer.stop()
+    writer.enqueue(make_request("/api/after"), 200, None, {})  # Restarts the writer
+    await writer.stop()
+    assert writer.stats["written"] == 2
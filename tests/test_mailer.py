@@ -0,0 +1,120 @@
+import pytest
+from asyncio import sleep
+from socket import socket
+from time import perf_counter
+from typing import Iterator, List
+from aiosmtpd.controller import Controller
+from aiosmtplib import SMTPServerDisconnected
+from aiosmtpd.smtp import AuthResult, Envelope, LoginPassword, Session, SMTP
+from app.utils.mailer import SmtpMailer
+
+
+class SinkHandler:
+    def __init__(self) -> None:
+        self.logins: List[str] = []
+        self.delivered: List[str] = []
+        self.delays: List[float] = []  # Of DATA, popped per mail
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("bounce"):
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server: SMTP, session: Session, envelope: Envelope):
+        if self.delays:
+            await sleep(self.delays.pop(0))
+        self.delivered.extend(envelope.rcpt_tos)
+        return "250 Message accepted for delivery"
+
+    def authenticate(self, server, session, envelope, mechanism, auth_data):
+        if isinstance(auth_data, LoginPassword) and auth_data.password == b"secret":
+            self.logins.append(auth_data.login.decode())
+            return AuthResult(success=True)
+        return AuthResult(success=False, handled=False)
+
+
+@pytest.fixture(scope="function")
+def smtp_sink() -> Iterator[Controller]:
+    with socket() as sock:  # Controller can't bind port 0, so pick a free one
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    handler = SinkHandler()
+    controller = Controller(
+        handler,
+        hostname="127.0.0.1",
+        port=port,
+        authenticator=handler.authenticate,
+        auth_require_tls=False,
+    )
+    controller.start()
+    yield controller
+    controller.stop()
+
+
+def sink_mailer(sink: Controller, pool_size: int, rate_limit: float) -> SmtpMailer:
+    return SmtpMailer(
+        hostname=sink.hostname,
+        port=sink.port,
+        username="sender@test.local",
+        password="secret",
+        sender="Tester",
+        use_tls=False,
+        pool_size=pool_size,
+        rate_limit=rate_limit,
+        timeout=5.0,
+    )
+
+
+@pytest.mark.asyncio
+async def test_mailer_send_bulk(smtp_sink):
+    mailer = sink_mailer(smtp_sink, pool_size=2, rate_limit=40.0)
+    emails = [f"user{i}@test.local" for i in range(9)] + ["bounce@test.local"]
+    started_at = perf_counter()
+    try:
+        results = await mailer.send_bulk(
+            (email, "Hello", f"<p>Hello {email}</p>") for email in emails
+        )
+    finally:
+        await mailer.close()
+    assert perf_counter() - started_at >= 9 / 40  # Spaced by the rate limit
+    assert [result.email for result in results] == emails
+    assert all(result.sent for result in results[:-1])
+    assert not results[-1].sent and "No such user" in results[-1].error
+    assert sorted(smtp_sink.handler.delivered) == sorted(emails[:-1])
+    # Connections are reused, even the one a recipient was refused on
+    assert mailer.stats["connections_opened"] == len(smtp_sink.handler.logins) <= 2
+
+
+@pytest.mark.asyncio
+async def test_mailer_rate_limit_after_slow_send(smtp_sink):
+    smtp_sink.handler.delays = [0.5]  # Sends queue for the pool meanwhile
+    mailer = sink_mailer(smtp_sink, pool_size=1, rate_limit=10.0)
+    started_at = perf_counter()
+    try:
+        results = await mailer.send_bulk(
+            (f"user{i}@test.local", "Hello", "<p>Hello</p>") for i in range(6)
+        )
+    finally:
+        await mailer.close()
+    assert all(result.sent for result in results)
+    # Still spaced by the rate limit once the slow send is done, not sent at once
+    assert perf_counter() - started_at >= 0.5 + 4 / 10 - 0.05
+
+
+@pytest.mark.asyncio
+async def test_mailer_retries_dropped_connection(smtp_sink):
+    mailer = sink_mailer(smtp_sink, pool_size=1, rate_limit=0)
+    try:
+        assert (await mailer.send("user1@test.local", "Hello", "<p>1</p>")).sent
+        dropped = mailer._idle[0]  # Looks connected, but the server is gone
+
+        async def disconnected(*args, **kwargs):
+            raise SMTPServerDisconnected("Server disconnected")
+
+        dropped.send_message = dropped.rset = disconnected
+        assert (await mailer.send("user2@test.local", "Hello", "<p>2</p>")).sent
+    finally:
+        await mailer.close()
+    assert smtp_sink.handler.delivered == ["user1@test.local", "user2@test.local"]
+    assert mailer.stats["connections_opened"] == 2
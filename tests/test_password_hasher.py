@@ -0,0 +1,53 @@
+import asyncio
+import pytest
+from threading import Event, Lock
+from app.utils.encoding_and_hashing import PasswordHasher
+
+
+@pytest.mark.asyncio
+async def test_concurrency_bound():
+    hasher = PasswordHasher(rounds=4, max_concurrency=2)
+    release, lock = Event(), Lock()
+    running, peak = 0, 0
+
+    def blocking_hash() -> None:
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        release.wait(timeout=5)
+        with lock:
+            running -= 1
+
+    try:
+        tasks = [asyncio.create_task(hasher.run(blocking_hash)) for _ in range(5)]
+        for _ in range(100):  # Until the first hashes are running in threads
+            if running == 2:
+                break
+            await asyncio.sleep(0.01)
+        # Two hashes run, the other three wait in queue without taking a thread
+        assert running == 2
+        assert hasher.stats["in_flight"] == 2
+        assert hasher.stats["queue_depth"] == 3
+        assert hasher.stats["completed"] == 0
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert peak == 2
+        assert hasher.stats["in_flight"] == hasher.stats["queue_depth"] == 0
+        assert hasher.stats["completed"] == 5
+    finally:
+        release.set()
+        hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_hash_and_check():
+    hasher = PasswordHasher(rounds=4, max_concurrency=2)
+    try:
+        hashed_password = (await hasher.hash("password")).decode("utf-8")
+        assert await hasher.check("password", hashed_password)
+        assert not await hasher.check("wrong password", hashed_password)
+        assert hasher.stats["completed"] == 3
+    finally:
+        hasher.shutdown()
@@ -0,0 +1,69 @@
+import pytest
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.util import greenlet_spawn
+from app.database.pool import InstrumentedAsyncPool, LatencyHistogram
+
+
+class FakeConnection:
+    # Just enough of a DBAPI connection for the pool to reset and close it
+    def rollback(self) -> None:
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+def test_latency_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.stats["count"] == 0
+    assert histogram.stats["mean_ms"] == histogram.stats["p99_ms"] == 0.0
+
+    for milliseconds in (0.05, 0.3, 1, 3, 3, 2000):
+        histogram.observe(milliseconds)
+    stats = histogram.stats
+    assert stats["count"] == 6
+    assert stats["max_ms"] == 2000
+    assert stats["mean_ms"] == round(2007.35 / 6, 3)
+    # Buckets are upper-inclusive, and slower ones than the last bound go to "inf"
+    assert {bucket: count for bucket, count in stats["buckets"].items() if count} == {
+        "le_0.1": 1,
+        "le_0.5": 1,
+        "le_1": 1,
+        "le_5": 2,
+        "inf": 1,
+    }
+    assert sum(stats["buckets"].values()) == 6
+    assert stats["p50_ms"] == 1  # Upper bound of the bucket of the 3rd observation
+    assert stats["p99_ms"] == 2000  # Beyond the last bound, the max is the best bound
+
+
+@pytest.mark.asyncio
+async def test_checkout_counters():
+    pool = InstrumentedAsyncPool(
+        FakeConnection, pool_size=1, max_overflow=0, timeout=0.05
+    )
+    try:
+        first = await greenlet_spawn(pool.connect)
+        stats = pool.stats
+        assert (stats["checked_out"], stats["idle"]) == (1, 0)
+        assert stats["checkout_timeouts"] == 0
+        assert stats["checkout_wait"]["count"] == 1
+
+        # The only connection is checked out, so the next checkout times out
+        with pytest.raises(TimeoutError):
+            await greenlet_spawn(pool.connect)
+        stats = pool.stats
+        assert stats["checkout_timeouts"] == 1
+        assert stats["checkout_wait"]["count"] == 2
+        assert stats["checkout_wait"]["max_ms"] >= 50
+
+        await greenlet_spawn(first.close)
+        assert (pool.stats["checked_out"], pool.stats["idle"]) == (0, 1)
+        second = await greenlet_spawn(pool.connect)
+        stats = pool.stats
+        assert (stats["checked_out"], stats["idle"]) == (1, 0)
+        assert stats["checkout_timeouts"] == 1
+        assert stats["checkout_wait"]["count"] == 3
+        await greenlet_spawn(second.close)
+    finally:
+        await greenlet_spawn(pool.dispose)
@@ -0,0 +1,69 @@
+import pytest
+from httpx import AsyncClient
+from app.errors.exceptions import TooManyRequestsEx
+from app.middlewares import rate_limiter as rate_limiter_module
+from app.middlewares.rate_limiter import (
+    BLOCKED_RETRY_AFTER,
+    SharedTokenBucketTable,
+    rate_limiter,
+)
+
+
+@pytest.fixture(scope="function")
+def table(tmp_path) -> SharedTokenBucketTable:
+    bucket_table = SharedTokenBucketTable(path=str(tmp_path / "buckets"), slots=64)
+    yield bucket_table
+    bucket_table.close()
+
+
+@pytest.fixture(scope="function")
+def clock(monkeypatch) -> list:
+    now = [1000.0]
+    monkeypatch.setattr(rate_limiter_module, "time", lambda: now[0])
+    return now
+
+
+def test_burst_then_retry_after(table, clock):
+    assert [table.consume("ip:a", rate=2, burst=3) for _ in range(3)] == [0.0] * 3
+    assert table.consume("ip:a", rate=2, burst=3) == pytest.approx(0.5)
+    assert table.consume("ip:b", rate=2, burst=3) == 0.0  # Own bucket per key
+
+
+def test_refill(table, clock):
+    for _ in range(3):
+        table.consume("ip:a", rate=2, burst=3)
+    clock[0] += 0.25  # Half a token
+    assert table.consume("ip:a", rate=2, burst=3) == pytest.approx(0.25)
+    clock[0] += 0.25
+    assert table.consume("ip:a", rate=2, burst=3) == 0.0
+    clock[0] += 100  # Refilled up to burst only
+    assert [table.consume("ip:a", rate=2, burst=3) for _ in range(4)][-1] > 0
+
+
+def test_shared_across_processes(table, clock):
+    other_worker = SharedTokenBucketTable(path=table.path, slots=64)
+    try:
+        table.consume("key:a", rate=1, burst=1)
+        assert other_worker.consume("key:a", rate=1, burst=1) == pytest.approx(1.0)
+    finally:
+        other_worker.close()
+
+
+def test_zero_rate_blocks(table, clock):
+    assert table.consume("key:a", rate=0, burst=5) == BLOCKED_RETRY_AFTER
+    assert table.consume("key:a", rate=1, burst=0) == BLOCKED_RETRY_AFTER
+
+
+@pytest.mark.asyncio
+async def test_retry_after_header(app, table, clock, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "enabled", True)
+    monkeypatch.setattr(rate_limiter, "table", table)
+    monkeypatch.setattr(rate_limiter, "ip_rate", 0.5)
+    monkeypatch.setattr(rate_limiter, "ip_burst", 1)
+    table.consume("ip:127.0.0.1", rate=0.5, burst=1)
+    with pytest.raises(TooManyRequestsEx):
+        rate_limiter.check_ip("127.0.0.1")
+    async with AsyncClient(app=app, base_url="http://localhost") as client:
+        res = await client.get("/api/services")
+    assert res.status_code == 429
+    assert res.headers["Retry-After"] == "2"
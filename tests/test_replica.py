@@ -0,0 +1,76 @@
+from typing import AsyncGenerator
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+import pytest
+import pytest_asyncio
+from app.database.connection import Base
+from app.database.schema import db, Users
+
+
+@pytest_asyncio.fixture(scope="function")
+async def sqlite_replica(tmp_path) -> AsyncGenerator:
+    """
+    Two SQLite files standing in for primary and replica.
+    Replication is not simulated, so a row written to one is not seen in the other.
+    """
+    primary_engine, primary_session, replica_router = (
+        db.engine,
+        db.session,
+        db.replica_router,
+    )
+    db.create_engines(
+        database_url=f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}",
+        replica_database_urls=[f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}"],
+    )
+    for engine in [db.engine] + db.replica_router.engines:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    yield db.replica_router.engines[0]
+    await db.dispose_engines()
+    db.engine, db.session, db.replica_router = (
+        primary_engine,
+        primary_session,
+        replica_router,
+    )
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_replica(sqlite_replica):
+    async with sqlite_replica.begin() as conn:
+        await conn.execute(insert(Users).values(email="replica@test.com"))
+    assert await Users.first_filtered_by(email="replica@test.com") is not None
+    with db.use_primary():
+        assert await Users.first_filtered_by(email="replica@test.com") is None
+    assert (
+        await db.execute(select(Users).filter_by(email="replica@test.com"))
+    ).first() is None  # execute() always goes to primary
+
+
+@pytest.mark.asyncio
+async def test_read_your_writes(sqlite_replica):
+    async with sqlite_replica.begin() as conn:
+        await conn.execute(insert(Users).values(email="replica@test.com"))
+    async with db.request_scope():
+        assert await Users.first_filtered_by(email="replica@test.com") is not None
+        await Users.add_one(autocommit=True, email="primary@test.com")
+        # Committed in this request, so its later reads go to primary
+        assert await Users.first_filtered_by(email="primary@test.com") is not None
+        assert await Users.first_filtered_by(email="replica@test.com") is None
+    # Not after the request ends, nor outside any request
+    assert await Users.first_filtered_by(email="replica@test.com") is not None
+    await Users.add_one(autocommit=True, email="no-request@test.com")
+    assert await Users.first_filtered_by(email="replica@test.com") is not None
+
+
+@pytest.mark.asyncio
+async def test_failed_replica_falls_back_to_primary(sqlite_replica, tmp_path):
+    async with db.engine.begin() as conn:
+        await conn.execute(insert(Users).values(email="primary@test.com"))
+    unreachable_replica = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'replica.db'}"
+    )
+    db.replica_router.engines[0] = unreachable_replica
+    assert await Users.first_filtered_by(email="primary@test.com") is not None
+    assert db.replica_router.stats["healthy"] == 0
+    assert db.replica_router.pick() is None
+    await unreachable_replica.dispose()
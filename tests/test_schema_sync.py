@@ -0,0 +1,46 @@
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    create_engine,
+    event,
+    inspect,
+)
+from app.database.schema_sync import is_synced, sync_schema
+
+
+def declare(*extra_columns: Column) -> MetaData:
+    metadata = MetaData()
+    Table(
+        "items",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("name", String(length=20)),
+        *extra_columns,
+    )
+    return metadata
+
+
+def test_sync_schema(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    statements = []
+    event.listen(
+        engine, "before_cursor_execute", lambda *args: statements.append(args[2])
+    )
+    with engine.connect() as conn:
+        assert not is_synced(conn, declare())
+        assert sync_schema(conn, declare()) == []
+        assert is_synced(conn, declare())
+    with engine.connect() as conn:
+        statements.clear()
+        assert sync_schema(conn, declare()) is None  # Unchanged: no DDL
+        assert not any(s.startswith(("CREATE", "ALTER")) for s in statements)
+    with engine.connect() as conn:  # ADD COLUMN and CREATE INDEX on existing table
+        added = sync_schema(conn, declare(Column("code", String(8), index=True)))
+        assert len(added) == 2
+        assert not is_synced(conn, declare())
+        assert "code" in {c["name"] for c in inspect(conn).get_columns("items")}
+        assert sync_schema(conn, declare(Column("code", String(8), index=True))) is None
+    engine.dispose()
@@ -0,0 +1,97 @@
+import pytest
+from hashlib import sha256
+from time import time
+from uuid import uuid4
+from app.common.config import Config, JWT_ALGORITHM, JWT_SECRET
+from app.errors.exceptions import TokenDecodeEx
+from app.utils import encoding_and_hashing
+from app.utils.cache_utils import StatsTLRUCache
+from app.utils.encoding_and_hashing import (
+    create_access_token,
+    token_decode,
+    verified_token_cache,
+)
+
+
+def digest(token: str) -> bytes:
+    return sha256(token.encode("utf-8")).digest()
+
+
+@pytest.fixture(scope="function")
+def decode_calls(monkeypatch) -> list:
+    # Counts signature verifications done by jwt
+    calls = []
+
+    def counting_jwt_decode(*args, **kwargs) -> dict:
+        calls.append(args)
+        return jwt_decode(*args, **kwargs)
+
+    jwt_decode = encoding_and_hashing.jwt_decode
+    monkeypatch.setattr(encoding_and_hashing, "jwt_decode", counting_jwt_decode)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_cache_hit(decode_calls):
+    token = create_access_token(data={"id": 1, "nonce": uuid4().hex}, expires_delta=1)
+    payload = await token_decode(f"Bearer {token}")
+    assert await token_decode(f"Bearer {token}") == payload
+    assert await token_decode(token) == payload
+    assert len(decode_calls) == 1
+
+    # Invalid tokens are never cached
+    for _ in range(2):
+        with pytest.raises(TokenDecodeEx):
+            await token_decode("Bearer invalid")
+    assert len(decode_calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_expiry():
+    token = create_access_token(data={"id": 1, "nonce": uuid4().hex}, expires_delta=1)
+    payload = await token_decode(token)
+    verified_token_cache.expire(payload["exp"] - 1)
+    assert digest(token) in verified_token_cache
+    verified_token_cache.expire(payload["exp"])  # Not kept past the token's exp
+    assert digest(token) not in verified_token_cache
+
+    # Without "exp", kept for token_cache_ttl from when it was verified
+    token = create_access_token(data={"id": 1, "nonce": uuid4().hex})
+    verified_at = time()
+    await token_decode(token)
+    verified_token_cache.expire(verified_at + Config.get().token_cache_ttl - 1)
+    assert digest(token) in verified_token_cache
+    verified_token_cache.expire(time() + Config.get().token_cache_ttl)
+    assert digest(token) not in verified_token_cache
+
+
+@pytest.mark.asyncio
+async def test_eviction(monkeypatch, decode_calls):
+    tokens = [
+        create_access_token(data={"id": index, "nonce": uuid4().hex}, expires_delta=1)
+        for index in range(10)
+    ]
+    payload_bytes = verified_token_cache.getsizeof(
+        encoding_and_hashing.jwt_decode(
+            tokens[0], key=JWT_SECRET, algorithms=[JWT_ALGORITHM]
+        )
+    )
+    decode_calls.clear()
+    # As configured, but with room for 3 payloads only
+    small_cache = StatsTLRUCache(
+        maxsize=payload_bytes * 3 + payload_bytes // 2,
+        ttu=verified_token_cache.ttu,
+        timer=time,
+        getsizeof=verified_token_cache.getsizeof,
+    )
+    monkeypatch.setattr(encoding_and_hashing, "verified_token_cache", small_cache)
+    for token in tokens:
+        await token_decode(token)
+    assert small_cache.currsize <= small_cache.maxsize
+    assert len(small_cache) == 3
+    assert small_cache.evictions == 7
+    # The least recently used are evicted, and verified again when used
+    await token_decode(tokens[-1])
+    assert len(decode_calls) == 10
+    await token_decode(tokens[0])
+    assert len(decode_calls) == 11